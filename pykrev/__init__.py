@@ -1,5 +1,17 @@
 __version__ = '1.2.3'
 
 from .formula import *
-from .plotting import *
-from .diversity import *
\ No newline at end of file
+from . import diversity, plotting
+# diversity and plotting functions are loaded when first used, see pykrev.diversity.__getattr__ and pykrev.plotting.__getattr__
+__all__ = [name for name in globals() if not name.startswith('_')] + diversity.__all__ + plotting.__all__
+
+def __getattr__(name):
+    for subpackage in (diversity, plotting):
+        if name in subpackage.__all__:
+            value = getattr(subpackage, name)
+            globals()[name] = value
+            return value
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -1,6 +1,27 @@
-from .diversity_indices import diversity_indices
-from .normalise_intensity import normalise_intensity
-from .bray_curtis_matrix import bray_curtis_matrix
-from .ordination_matrix import ordination_matrix
-from .compound_class import compound_class
-from .page_rank import page_rank
\ No newline at end of file
+import importlib
+import types
+# functions are imported from their modules when first used, so that importing pykrev does not load scipy
+__all__ = ['diversity_indices',
+           'diversity_matrix',
+           'rao_entropy',
+           'normalise_intensity',
+           'bray_curtis_matrix',
+           'ordination_matrix',
+           'compound_class',
+           'register_compound_class',
+           'kegg_brite',
+           'page_rank']
+
+def __getattr__(name):
+    if name in __all__:
+        importlib.import_module(f'.{name}', __name__)
+        # importing a module binds it, and any module it imports from this package, as a package attribute: replace them with their functions
+        for loaded in __all__:
+            value = globals().get(loaded)
+            if isinstance(value, types.ModuleType):
+                globals()[loaded] = getattr(value, loaded)
+        return globals()[name]
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -1,31 +1,89 @@
 import numpy as np
+import pandas as pd
 from scipy import spatial
-def bray_curtis_matrix(matrix):
-    """ 
-	Docstring for function pyKrev.bray_curtis_matrix 
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype = np.uint16) # number of set bits of each byte
+def bray_curtis_matrix(matrix, metric = 'braycurtis', square = True, memory_limit = 2**27):
+    """
+	Docstring for function pyKrev.bray_curtis_matrix
 	====================
-	This function Scipy bray curtis function to compute a dissimilarity matrix of dimensions row * row.  
-    
+	This function computes a dissimilarity matrix of dimensions row * row, using the Bray-Curtis dissimilarity or a presence/absence (Jaccard or Sorensen) dissimilarity.
+
 	Use
 	----
 	bray_curtis_matrix(Y)
-    
-	Returns a numpy array of shape(len(Y[:,0]),len(Y[:,0])) in which each value is the bray curtis dissimilarity value.  
-    
+
+	Returns a numpy array of shape(len(Y[:,0]),len(Y[:,0])) in which each value is the dissimilarity between two rows of Y.
+    If square is False, returns the condensed matrix instead: a numpy array of length row * (row - 1) / 2 containing the dissimilarity of each pair of rows i < j
+    in the order (0,1), (0,2), ... (1,2) ... (as scipy.spatial.distance.pdist).
+
 	Parameters
 	----------
-	Y: A numpy array containing peak intensities - where rows correspond to samples and columns correspond to molecular formula
-    
+	Y: A numpy array containing peak intensities - where rows correspond to samples and columns correspond to molecular formula,
+        or an ordination matrix (pandas.DataFrame) produced by pykrev.ordination_matrix. nan intensities are treated as absent formula (0).
+    metric: String, the dissimilarity, one of:
+        'braycurtis' - sum(|u - v|) / sum(|u + v|)
+        'jaccard' - the proportion of the formula present in either sample that are not present in both
+        'sorensen' - the number of formula present in only one sample divided by the sum of the number of formula in each sample
+    square: boolean, return the square (row x row) matrix (default) or the condensed matrix.
+    memory_limit: int, the maximum number of bytes of the intermediate arrays used to compute a block of the matrix.
+
 	Info
 	----------
-	The Bray-Curtis dissimilarity is always a number between 0 and 1. If 0, the two samples share all the same formula; if 1, they don’t share any formula. 
-        
-    """  
-    assert(isinstance(matrix,np.ndarray)), 'must provide a numpy array'
+	The Bray-Curtis dissimilarity is always a number between 0 and 1. If 0, the two samples share all the same formula; if 1, they don’t share any formula.
+    A formula is present in a sample if its intensity is not 0. Dissimilarities are equal to those of scipy.spatial.distance.braycurtis, jaccard and dice,
+    including nan for the Bray-Curtis and Sorensen dissimilarity of two samples without any formula.
+    The matrix is computed in blocks of samples (and formula) bounded by memory_limit and each pair of samples is computed once, so memory is O(row^2) for the result only.
+    Bray-Curtis blocks are computed with scipy.spatial.distance.cdist.
+    Presence and absence is packed into bits, and the formula shared by two samples are counted from the bits set in both.
+    """
+    #Tests
+    assert(isinstance(matrix,(np.ndarray,pd.DataFrame))), 'must provide a numpy array or an ordination matrix'
     assert(len(matrix.shape) != 1), 'must provide at least two columns'
-    row,col = np.shape(matrix)
+    assert metric in ['braycurtis','jaccard','sorensen'], "metric must be 'braycurtis', 'jaccard' or 'sorensen'"
+    #Setup
+    X = np.nan_to_num(np.asarray(matrix, dtype = float))
+    row = len(X)
+    block = max(1, min(256, int(np.sqrt(memory_limit / 8))))
+    if metric != 'braycurtis':
+        bits = np.packbits(X != 0, axis = 1)
+        counts = _POPCOUNT[bits].sum(axis = 1, dtype = np.int64)
+        featureChunk = max(1, memory_limit // (3 * block * block)) # bytes of the (block x block x chunk) AND and its popcount
+    #Main
+    condensed = np.empty(row * (row - 1) // 2)
+    for start in range(0, row, block):
+        stop = min(start + block, row)
+        ## a panel of the dissimilarities of rows start:stop with every row from start onwards
+        panel = np.empty((stop - start, row - start))
+        for columnStart in range(start, row, block):
+            columnStop = min(columnStart + block, row)
+            if metric == 'braycurtis':
+                with np.errstate(invalid = 'ignore', divide = 'ignore'):
+                    tile = spatial.distance.cdist(X[start:stop], X[columnStart:columnStop], 'braycurtis')
+            else:
+                shared = _pairwise_shared(bits[start:stop], bits[columnStart:columnStop], featureChunk)
+                total = counts[start:stop,None] + counts[None,columnStart:columnStop]
+                with np.errstate(invalid = 'ignore', divide = 'ignore'):
+                    if metric == 'jaccard':
+                        union = total - shared
+                        tile = np.where(union > 0, 1 - shared / np.where(union > 0, union, 1), 0)
+                    else:
+                        tile = (total - 2 * shared) / total
+            panel[:, columnStart - start:columnStop - start] = tile
+        for i in range(start, stop):
+            offset = row * i - i * (i + 1) // 2 # index of the pair (i, i+1) in the condensed matrix
+            condensed[offset:offset + row - i - 1] = panel[i - start, i - start + 1:]
+    if square == False:
+        return condensed
     transformed_matrix = np.zeros((row,row))
-    for x in range(0,row):
-        for i in range(0,row):
-            transformed_matrix[i,x] = spatial.distance.braycurtis(matrix[x,:],matrix[i,:])
-    return transformed_matrix
\ No newline at end of file
+    for i in range(row - 1):
+        offset = row * i - i * (i + 1) // 2
+        transformed_matrix[i, i+1:] = condensed[offset:offset + row - i - 1]
+        transformed_matrix[i+1:, i] = transformed_matrix[i, i+1:]
+    return transformed_matrix
+
+def _pairwise_shared(bitsA, bitsB, chunk):
+    """ The (len(A) x len(B)) matrix of the number of bits set in both of each pair of rows of two bit packed presence matrices. """
+    result = np.zeros((len(bitsA), len(bitsB)), dtype = np.int64)
+    for k in range(0, bitsA.shape[1], chunk):
+        result += _POPCOUNT[bitsA[:,None,k:k+chunk] & bitsB[None,:,k:k+chunk]].sum(axis = 2, dtype = np.int64)
+    return result
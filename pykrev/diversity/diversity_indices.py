@@ -1,8 +1,4 @@
-from ..formula.element_counts import element_counts
-from ..formula.element_ratios import element_ratios
-from ..formula.aromaticity_index import aromaticity_index
-from ..formula.double_bond_equivalent import double_bond_equivalent
-from ..formula.nominal_oxidation_state import nominal_oxidation_state
+from ..formula.descriptors import descriptors
 from .normalise_intensity import normalise_intensity
 import numpy as np
 def diversity_indices (msTuple,indices = ['r','GS','SW','C','O','NOSC','DBE','rAI','HC','OC'],verbose = True):
@@ -54,31 +50,19 @@ def diversity_indices (msTuple,indices = ['r','GS','SW','C','O','NOSC','DBE','rA
         print('Warning: duplicates detected in formula list. Remove to avoid inaccuracies.')
     if 'mz' in indices: 
         assert len(mz_list) == len(formula_list), 'you must provide an mz list if to calculate mz functional diversity'
-    #calculate element counts, element ratios and other feature types for functional diversity metric
-    count_list = element_counts(formula_list)
-    ratio_list = element_ratios(formula_list, ratios = ['HC','OC','NC'])
-    C_list = []
-    O_list = []
-    N_list = []
-    HC_list = []
-    OC_list = []
-    NC_list = []
-    for i,z in zip(count_list,ratio_list):
-        C_list.append(i['C'])
-        HC_list.append(z['HC'])
-        O_list.append(i['O'])
-        OC_list.append(z['OC'])
-        N_list.append(i['N'])
-        NC_list.append(z['NC'])
-    C_list = np.array(C_list)
-    O_list = np.array(O_list)
-    HC_list = np.array(HC_list)
-    OC_list = np.array(OC_list)
-    N_list = np.array(N_list)
-    NC_list = np.array(NC_list)
-    AI_list = aromaticity_index(formula_list,index_type='rAI')
-    DBE_list = double_bond_equivalent(formula_list)
-    NOSC_s = nominal_oxidation_state(formula_list)
+    #calculate element counts, element ratios and other feature types for functional diversity metric in a single pass
+    traits = [i for i in ['C','O','N','HC','OC','NC','rAI','DBE','NOSC'] if i in indices]
+    traitTable = descriptors(formula_list, names = traits)
+    traitArrays = {i: traitTable[i].to_numpy(dtype = float) for i in traits}
+    C_list = traitArrays.get('C')
+    O_list = traitArrays.get('O')
+    N_list = traitArrays.get('N')
+    HC_list = traitArrays.get('HC')
+    OC_list = traitArrays.get('OC')
+    NC_list = traitArrays.get('NC')
+    AI_list = traitArrays.get('rAI')
+    DBE_list = traitArrays.get('DBE')
+    NOSC_s = traitArrays.get('NOSC')
     diversity_indices = dict()
     # Main
     #Firstly normalise the intensity_list
@@ -110,37 +94,21 @@ def diversity_indices (msTuple,indices = ['r','GS','SW','C','O','NOSC','DBE','rA
         print('Functional based diversity:')
     #Calculate functional diversity based on C number, H/C ratio and oxidation state of C 
     #Include modified aromaticity index 
-    D_f_C = 0
-    D_f_O = 0
-    D_f_N = 0
-    D_f_HC = 0 
-    D_f_OC = 0
-    D_f_NC = 0
-    D_f_rAI = 0 
-    D_f_DBE = 0 
-    D_f_NOSC = 0 
-    D_f_mz = 0 
-    for i in range(0,len(formula_list)-1):
-        if 'C' in indices: 
-            D_f_C += sum((rel_abundance[i] * rel_abundance[i+1::] * abs(C_list[i] - C_list[i+1::])))
-        if 'O' in indices: 
-            D_f_O += sum((rel_abundance[i] * rel_abundance[i+1::] * abs(O_list[i] - O_list[i+1::])))
-        if 'N' in indices: 
-            D_f_N += sum(rel_abundance[i] * rel_abundance[i+1::] * abs(N_list[i] - N_list[i+1::]))
-        if 'HC' in indices: 
-            D_f_HC += sum(rel_abundance[i] * rel_abundance[i+1::] * abs(HC_list[i] - HC_list[i+1::]))
-        if 'OC' in indices: 
-            D_f_OC += sum(rel_abundance[i] * rel_abundance[i+1::] * abs(OC_list[i] - OC_list[i+1::]))
-        if 'NC' in indices: 
-            D_f_NC += sum(rel_abundance[i] * rel_abundance[i+1::] * abs(NC_list[i] - NC_list[i+1::]))
-        if 'rAI' in indices:
-            D_f_rAI += sum(rel_abundance[i] * rel_abundance[i+1::] * abs(AI_list[i] - AI_list[i+1::]))
-        if 'DBE' in indices:
-            D_f_DBE += sum(rel_abundance[i] * rel_abundance[i+1::] * abs(DBE_list[i] - DBE_list[i+1::]))
-        if 'NOSC' in indices: 
-            D_f_NOSC += sum(rel_abundance[i] * rel_abundance[i+1::] * abs(NOSC_s[i] - NOSC_s[i+1::]))
-        if 'mz' in indices: 
-            D_f_mz += sum(rel_abundance[i] * rel_abundance[i+1::] * abs(mz_list[i] - mz_list[i+1::]))
+    #Rao's entropy of every functional trait at once, in O(N log N) (see _rao_1d)
+    functional = [i for i in ['C','O','N','HC','OC','NC','rAI','DBE','NOSC','mz'] if i in indices]
+    if 'mz' in indices:
+        traitArrays['mz'] = np.asarray(mz_list, dtype = float)
+    raoIndices = dict(zip(functional, _rao_1d([traitArrays[i] for i in functional], rel_abundance)))
+    D_f_C = raoIndices.get('C')
+    D_f_O = raoIndices.get('O')
+    D_f_N = raoIndices.get('N')
+    D_f_HC = raoIndices.get('HC')
+    D_f_OC = raoIndices.get('OC')
+    D_f_NC = raoIndices.get('NC')
+    D_f_rAI = raoIndices.get('rAI')
+    D_f_DBE = raoIndices.get('DBE')
+    D_f_NOSC = raoIndices.get('NOSC')
+    D_f_mz = raoIndices.get('mz')
     if 'C' in indices: 
         if verbose == True:
             print('Raos Quadratic Index (C Number): ', D_f_C)
@@ -181,4 +149,26 @@ def diversity_indices (msTuple,indices = ['r','GS','SW','C','O','NOSC','DBE','rA
         if verbose == True:
             print('Raos Quadratic Index (mz): ', D_f_mz)
         diversity_indices['D_f_mz'] = D_f_mz
-    return diversity_indices
\ No newline at end of file
+    return diversity_indices
+
+def _rao_1d(traits, p):
+    """ Rao's quadratic entropy, the sum over i < j of p[i] * p[j] * |x[i] - x[j]|, for each row x of traits.
+        Each row is sorted, after which every |x[i] - x[j]| is x[j] - x[i] for i before j, so the sum is
+        sum_j p[j] * (x[j] * (sum_{i<j} p[i]) - sum_{i<j} p[i] * x[i]), computed with prefix sums in O(N log N).
+        Rows containing nan return nan, as any nan term makes the pairwise sum nan. """
+    if len(p) < 2:
+        return np.zeros(len(traits))
+    traits = np.asarray(traits, dtype = float).reshape(-1, len(p))
+    p = np.asarray(p, dtype = float)
+    order = np.argsort(traits, axis = 1, kind = 'stable')
+    rao = _rao_sorted(np.take_along_axis(traits, order, axis = 1), p[order])
+    rao[np.isnan(traits).any(axis = 1)] = np.nan
+    return rao
+
+def _rao_sorted(x, w):
+    """ Rao's quadratic entropy of weights w (along the last axis) over values x sorted in ascending order, using prefix sums of the
+        weights and weighted values before each position. """
+    zeros = np.zeros(w.shape[:-1] + (1,))
+    weightBefore = np.concatenate([zeros, np.cumsum(w, axis = -1)[...,:-1]], axis = -1)
+    weightedBefore = np.concatenate([zeros, np.cumsum(w * x, axis = -1)[...,:-1]], axis = -1)
+    return np.sum(w * (x * weightBefore - weightedBefore), axis = -1)
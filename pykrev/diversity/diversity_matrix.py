@@ -0,0 +1,138 @@
+import numpy as np
+import pandas as pd
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+from ..formula.descriptors import descriptors
+from ..formula.formula_vocabulary import _encode_samples, _scatter_samples
+from .diversity_indices import _rao_1d, _rao_sorted
+_TRAITS = ['C','O','N','HC','OC','NC','rAI','DBE','NOSC']
+def diversity_matrix(Y, indices = ['r','GS','SW','C','O','NOSC','DBE','rAI','HC','OC'], q = [0,1,2], formula = None, n_jobs = 1):
+    """
+    Docstring for function pykrev.diversity_matrix
+    ==========
+    Calculates diversity indices (richness, abundance-based and functional) for every sample of a cohort at once.
+
+    Use
+    ----------
+    diversity_matrix(Y)
+
+    Returns a pandas.DataFrame with one row per sample and one column per index, named as the keys returned by pykrev.diversity_indices
+    (e.g. 'D_r', 'D_a_GS', 'D_f_HC'). Hill numbers are named 'D_q' followed by their order, e.g. 'D_q2'.
+
+    Parameters
+    ----------
+    Y: an msTupleDict or msTupleStore (or a dictionary of msTuples),
+        OR an ordination matrix produced by pykrev.ordination_matrix (samples x formula), absent formula are nan or 0,
+        OR a numpy array of shape (samples, formula) of peak intensities, together with formula.
+
+    indices: list, the indices to calculate, any of those of pykrev.diversity_indices:
+        'r', 'GS', 'SW', 'C', 'O', 'N', 'HC', 'OC', 'NC', 'NOSC', 'DBE', 'rAI', 'mz' ('mz' requires an msTupleDict)
+        and 'Hill', Hill numbers of each order in q.
+
+    q: list, the orders of the Hill numbers. Order 0 is the richness, order 1 the exponential of the Shannon-Wiener index and order 2 the inverse Simpson index.
+
+    formula: list, the molecular formula of the columns of Y, if Y is a numpy array.
+
+    n_jobs: int, the number of processes used to calculate the functional indices, the samples are split between processes.
+
+    Info
+    ----------
+    Indices are equal to those of pykrev.diversity_indices for each sample, calculated with relative intensities (sum normalised).
+    Descriptors are computed once for the union of the formula of all samples and every index is calculated for all samples as a matrix operation.
+    Each functional trait is sorted once over the union of the formula and Rao's quadratic entropy of every sample is computed with prefix sums in that order.
+    If a formula occurs more than once in a sample the first occurrence is used.
+    Samples without any intensity have a richness of 0 and nan abundance based and functional indices.
+    """
+    #Tests
+    functional = [i for i in _TRAITS + ['mz'] if i in indices]
+    assert n_jobs >= 1, 'n_jobs must be at least 1'
+    #Setup
+    traits = [i for i in _TRAITS if i in functional]
+    mz = None
+    if isinstance(Y, Mapping):
+        sampleNames = list(Y.keys())
+        vocabulary, sampleCodes = _encode_samples(Y)
+        sampleCodes = list(sampleCodes.values())
+        intensity, columnCodes = _scatter_samples(sampleCodes, (msTupleObj[1] for msTupleObj in Y.values()), len(vocabulary), fill = np.nan)
+        traitTable = vocabulary._descriptor_table(traits).iloc[columnCodes]
+        present = ~np.isnan(intensity)
+        if 'mz' in indices:
+            for msTupleObj, codes in zip(Y.values(), sampleCodes):
+                assert len(msTupleObj[2]) == len(codes), 'you must provide an mz list if to calculate mz functional diversity'
+            mz = [(np.asarray(msTupleObj[2], dtype = float), np.asarray(msTupleObj[1], dtype = float)) for msTupleObj in Y.values()]
+    else:
+        assert 'mz' not in indices, "'mz' functional diversity requires an msTupleDict"
+        if isinstance(Y, pd.DataFrame):
+            sampleNames = list(Y.index)
+            formula = list(Y.columns)
+        else:
+            assert formula is not None, 'provide the formula of the columns of Y'
+            sampleNames = list(range(len(Y)))
+        intensity = np.asarray(Y, dtype = float)
+        traitTable = descriptors(list(formula), names = traits)
+        present = np.nan_to_num(intensity) != 0
+    #Main
+    ## relative intensities are sum normalised, absent formula have a relative intensity of 0
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        p = np.nan_to_num(intensity)
+        p = p / p.sum(axis = 1, keepdims = True)
+    table = pd.DataFrame(index = sampleNames)
+    ## samples without any intensity have no relative abundances (as in diversity_indices), their abundance based indices are nan
+    empty = ~np.isfinite(p).all(axis = 1)
+    p[empty] = 0
+    if 'r' in indices:
+        table['D_r'] = (p > 0).sum(axis = 1)
+    if 'GS' in indices:
+        table['D_a_GS'] = np.where(empty, np.nan, 1 - (p**2).sum(axis = 1))
+    if 'SW' in indices:
+        table['D_a_SW'] = np.where(empty, np.nan, _shannon(p))
+    if 'Hill' in indices:
+        for order in q:
+            with np.errstate(divide = 'ignore'):
+                table[f'D_q{order}'] = np.where(empty, np.nan, _hill_numbers(p, order))
+    ## functional indices, optionally split by sample between processes
+    traitArrays = {i: traitTable[i].to_numpy(dtype = float) for i in traits}
+    blocks = np.array_split(np.arange(len(p)), max(min(n_jobs, len(p)), 1))
+    jobs = [(p[rows], present[rows], traitArrays, [mz[i] for i in rows] if mz is not None else None) for rows in blocks]
+    if len(jobs) == 1:
+        results = [_functional_block(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers = n_jobs) as executor:
+            results = list(executor.map(_functional_block, jobs))
+    for i in functional:
+        table[f'D_f_{i}'] = np.where(empty, np.nan, np.concatenate([result[i] for result in results]))
+    return table
+
+def _shannon(p):
+    """ Shannon-Wiener index of each row of relative abundances p, zero abundances contribute 0. """
+    return -np.where(p > 0, p * np.log(np.where(p > 0, p, 1)), 0).sum(axis = 1)
+
+def _hill_numbers(p, q):
+    """ Hill numbers of order q of each row of relative abundances p, i.e. the effective number of formula. """
+    if q == 1:
+        return np.exp(_shannon(p))
+    powered = np.zeros_like(p)
+    np.power(p, q, out = powered, where = p > 0)
+    with np.errstate(divide = 'ignore'):
+        return powered.sum(axis = 1)**(1/(1-q))
+
+def _functional_block(job):
+    """ Rao's quadratic entropy of each functional trait for a block of samples. Each trait is sorted once and shared by all samples of the block. """
+    p, present, traitArrays, mz = job
+    results = dict()
+    for trait, x in traitArrays.items():
+        valid = ~np.isnan(x)
+        order = np.flatnonzero(valid)[np.argsort(x[valid], kind = 'stable')]
+        rao = _rao_sorted(x[order], p[:,order])
+        ## as in diversity_indices, a nan trait of any formula of a sample gives nan
+        rao[present[:,~valid].any(axis = 1)] = np.nan
+        results[trait] = rao
+    if mz is not None:
+        ## mz values are measured in each sample, so they are sorted per sample
+        raoMz = []
+        for mzSample, intensitySample in mz:
+            with np.errstate(invalid = 'ignore', divide = 'ignore'):
+                pSample = intensitySample / np.nansum(intensitySample)
+            raoMz.append(_rao_1d([mzSample], pSample)[0])
+        results['mz'] = np.array(raoMz)
+    return results
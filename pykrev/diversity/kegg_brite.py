@@ -0,0 +1,119 @@
+import os
+import numpy as np
+import pandas as pd
+from ..formula.read_npz import _str_to_bytes, _bytes_to_str
+BRITE_DATABASES = ['All','BioMol','Lipid','Phyto','Pesticide','Toxin']
+BRITE_LEVELS = ['A','B','C','D','E','F']
+_DATA_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'compound_data')
+_BRITE_CACHE = dict()
+def kegg_brite(msTuple, database = 'All', all_matches = False):
+    """
+    Docstring for function pykrev.kegg_brite
+    ==========
+    Matches the molecular formula of an msTuple to the compounds of a KEGG BRITE hierarchy and returns every level of the hierarchy.
+
+    Use
+    ----------
+    kegg_brite(Y)
+
+    Returns a pandas.DataFrame with columns A, B, C, D, E and F containing the BRITE hierarchy of the compound matched to each formula in Y[0],
+    in which row i corresponds to formula i of Y. Formula that are not in the database have NaN in every column.
+    A, B and C are the levels of the hierarchy (from broadest to narrowest), D is the KEGG compound name, E is the KEGG compound ID and F is the formula.
+
+    Parameters
+    ----------
+    Y: msTuple
+
+    database: String, the KEGG BRITE database to match against, one of:
+        'BioMol' - 'compounds with biological roles'
+        'Phyto' - 'phytochemicals'
+        'Lipid' - 'lipids'
+        'Pesticide' - 'pesticides'
+        'Toxin' - 'toxins'
+        'All' - all of the above
+
+    all_matches: bool, if False each formula is matched to the first compound listed in the database with that formula (as in pykrev.compound_class).
+        If True every compound with that formula is returned, with one row per match (rows are labelled by the position of the formula in Y[0]),
+        and formula that are not matched are left out.
+
+    Info
+    ----------
+    The databases are located in pykrev/diversity/compound_data. Each database is read once per process and indexed by formula.
+    A compact binary copy of each database is written to the user cache directory ($XDG_CACHE_HOME/pykrev, by default ~/.cache/pykrev,
+    or %LOCALAPPDATA%/pykrev on Windows) the first time it is read, and used by later processes.
+    Please refer to the KEGG website for information on BRITE heirarchies. https://www.genome.jp/kegg/brite.html
+    """
+    #Tests
+    assert database in BRITE_DATABASES, f'database must be one of {BRITE_DATABASES}'
+    #Setup
+    table, index = _brite_database(database)
+    formulaList = msTuple[0]
+    #Main
+    if all_matches == True:
+        matched = [(position, row) for position, formula in enumerate(formulaList) for row in index.get(formula, [])]
+        positions = [position for position, _ in matched]
+        rows = [row for _, row in matched]
+    else:
+        positions = range(len(formulaList))
+        rows = [index.get(formula, [-1])[0] for formula in formulaList]
+    # row -1 is not in the table, so reindex fills unmatched formula with NaN
+    brite = table.reindex(rows)
+    brite.index = pd.Index(positions, dtype = np.int64)
+    return brite
+
+def _brite_database(database):
+    """ Return the table of a KEGG BRITE database and a dictionary of formula: list of the rows of the table with that formula, loaded once per process. """
+    cached = _BRITE_CACHE.get(database)
+    if cached is None:
+        csvPath = os.path.join(_DATA_DIRECTORY, f'Brite_{database}_DF.csv')
+        npzPath = _cache_path(csvPath)
+        table = None
+        if os.path.exists(npzPath):
+            try:
+                table = _read_brite_npz(npzPath)
+            except (OSError, ValueError, KeyError):
+                table = None
+        if table is None:
+            table = pd.read_csv(csvPath, index_col = 0)[BRITE_LEVELS].reset_index(drop = True)
+            try:
+                _write_brite_npz(npzPath, table)
+            except OSError:
+                pass # e.g. there is no writable cache directory, the .csv file is read again by the next process
+        index = dict()
+        for row, formula in enumerate(table['F'].tolist()):
+            index.setdefault(formula, []).append(row)
+        cached = _BRITE_CACHE[database] = (table, index)
+    return cached
+
+def _cache_path(csvPath):
+    """ The path of the binary copy of a database in the user cache directory, named by the size and modification time of its .csv file
+        so that a changed (or differently installed) database is never read from a stale copy. """
+    if os.name == 'nt':
+        cacheDirectory = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+    else:
+        cacheDirectory = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    stat = os.stat(csvPath)
+    name = os.path.basename(csvPath)[:-len('.csv')]
+    return os.path.join(cacheDirectory, 'pykrev', f'{name}.{stat.st_size}-{stat.st_mtime_ns}.npz')
+
+def _write_brite_npz(path, table):
+    """ Write each column of a BRITE table as its unique values and int32 codes, replacing path only once the file is complete. """
+    arrays = dict()
+    for level in BRITE_LEVELS:
+        codes, uniques = pd.factorize(table[level])
+        arrays[f'{level}:values'] = _str_to_bytes('\n'.join(uniques.astype(str)))
+        arrays[f'{level}:codes'] = codes.astype(np.int32)
+    os.makedirs(os.path.dirname(path), exist_ok = True)
+    temporary = f'{path[:-len(".npz")]}.{os.getpid()}.npz'
+    np.savez(temporary, **arrays)
+    os.replace(temporary, path)
+
+def _read_brite_npz(path):
+    columns = dict()
+    with np.load(path, allow_pickle = False) as npz:
+        for level in BRITE_LEVELS:
+            codes = npz[f'{level}:codes']
+            # missing values (code -1) index the NaN appended to the unique values
+            uniques = np.array(_bytes_to_str(npz[f'{level}:values']).split('\n') + [np.nan], dtype = object)
+            columns[level] = uniques[codes]
+    return pd.DataFrame(columns)
@@ -1,6 +1,7 @@
 import pandas as pd
 import numpy as np
-def ordination_matrix(msTupleDict, impute_value = 'nan'):
+from ..formula.formula_vocabulary import _encode_samples, _scatter_samples
+def ordination_matrix(msTupleDict, impute_value = 'nan', sort_columns = 'occurrence', dtype = np.float64):
     """ 
 	Docstring for function pyKrev.ordination_matrix
 	====================
@@ -18,32 +19,34 @@ def ordination_matrix(msTupleDict, impute_value = 'nan'):
 	----------
 	Y: an msTupleDict
     impute_value: the value to impute when a formula isn't present in a group. An integer or float or 'nan' (default 0):
+    sort_columns: the order of the columns, one of:
+        'occurrence' - the order in which formula first occur in the samples of Y (default)
+        'formula' - alphabetical order of the formula
+        'mass' - increasing monoisotopic mass of the formula (formula of equal mass in alphabetical order)
+    dtype: the numpy dtype of the values, e.g. np.float64 (default) or np.float32 to halve the memory of large cohorts.
+
+	Info
+	----------
+    Formula are mapped to integer column codes with a single dictionary lookup each and intensities are scattered into a preallocated (samples x formula) array.
+    If a formula occurs more than once in a sample its first occurrence is used.
     """
+    #Tests
+    assert sort_columns in ['occurrence','formula','mass'], "sort_columns must be 'occurrence', 'formula' or 'mass'"
     #Setup
     if  impute_value == 'nan':
         impute_value = np.nan
-    group_names = msTupleDict.keys()
-    molecular_formulas = []
-    peak_intensities = []
-    for msTuple in msTupleDict.values():
-        molecular_formulas.append(msTuple[0])
-        peak_intensities.append(msTuple[1])
-    all_formula = set()
-    for flist in molecular_formulas:
-        all_formula.update(flist) #update the set with the formula in molecular_formula
-    all_formula = list(all_formula) #convert back to list for ease with indexing 
-    ordination_mat = pd.DataFrame(columns = all_formula,index = group_names)
-    col_index = 0
+    group_names = list(msTupleDict.keys())
+    vocabulary, sample_codes = _encode_samples(msTupleDict) #integer formula codes of each sample in a shared vocabulary
+    peak_intensities = (msTuple[1] for msTuple in msTupleDict.values()) #a generator, so that samples can be streamed
+    key = None #the column sort key of each formula code, None keeps the codes (first occurrence) order
+    if sort_columns != 'occurrence':
+        formula_rank = np.argsort(np.argsort(np.array(vocabulary.formula, dtype = object), kind = 'stable'), kind = 'stable')
+        if sort_columns == 'formula':
+            key = formula_rank
+        else:
+            mass = vocabulary._descriptor_table(['mass'])['mass'].to_numpy(dtype = float)
+            key = np.argsort(np.lexsort((formula_rank, mass)), kind = 'stable')
     #Main
-    for f in all_formula: #cycle through all_formula 
-        row_index = 0 
-        for flist, plist in zip(molecular_formulas,peak_intensities):
-            try:
-                i = flist.index(f) #find the first instance of the formula in flist
-                ordination_mat.iloc[row_index,col_index] = plist[i] #set the row value to the peak intensity for that sample 
-                row_index += 1  #move down a row i.e. sample
-            except ValueError: #if the formula can't be found 
-                ordination_mat.iloc[row_index,col_index] = impute_value #set the value to impute_value 
-                row_index += 1 #move down a row
-        col_index += 1 #move across to the next column i.e. formula
+    values, formula_codes = _scatter_samples(list(sample_codes.values()), peak_intensities, len(vocabulary), fill = impute_value, dtype = dtype, key = key)
+    ordination_mat = pd.DataFrame(values, columns = vocabulary.decode(formula_codes), index = group_names)
     return ordination_mat
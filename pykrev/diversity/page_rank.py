@@ -1,17 +1,7 @@
 from ..formula.calculate_mass import calculate_mass
 import numpy.linalg as la
 import numpy as np
-def page_rank(msTuple, reactionDict = {
-                                            'decarboxylation': -calculate_mass(['CO2']),
-                                            'methylation': calculate_mass(['CH2']),
-                                            'demethylation': -calculate_mass(['CH2']),
-                                            'hydrogenation': calculate_mass(['H2']),
-                                            'dehydrogenation': -calculate_mass(['H2']),
-                                            'hydration': calculate_mass(['H2O']),
-                                            'dehydration': -calculate_mass(['H2O']),
-                                            'oxidation': calculate_mass(['O']),
-                                            'reduction': -calculate_mass(['O'])
-                                            }, reactionWeights = {}, d = 0.9, tol = 0.01, roundVal = 8):
+def page_rank(msTuple, reactionDict = None, reactionWeights = {}, d = 0.9, tol = 0.01, roundVal = 8):
     """ 
 	Docstring for function PyKrev.page_rank
 	====================
@@ -29,15 +19,27 @@ def page_rank(msTuple, reactionDict = {
 	----------
 	Y: msTuple
     reactionDict: dictionary, containing reaction names as keys and their associated change in monoisotopic formula mass as values.
+        If not provided decarboxylation, (de)methylation, (de)hydrogenation, (de)hydration, oxidation and reduction are used.
     reactionWeights: dictionary, containing the relative weighting to give to each reactionType. If not provided each reactionWeight is given with equal value.
     d: float, damping factor in page rank algorithm
     tol: float, tolerance to run power iteration method to
     roundVal: int, number of digits to round to gor mass defect calculations
     """ 
     #Tests
+    if reactionDict is None:
+        reactionDict = {
+            'decarboxylation': -calculate_mass(['CO2']),
+            'methylation': calculate_mass(['CH2']),
+            'demethylation': -calculate_mass(['CH2']),
+            'hydrogenation': calculate_mass(['H2']),
+            'dehydrogenation': -calculate_mass(['H2']),
+            'hydration': calculate_mass(['H2O']),
+            'dehydration': -calculate_mass(['H2O']),
+            'oxidation': calculate_mass(['O']),
+            'reduction': -calculate_mass(['O'])
+        }
     if len(reactionWeights) == 0:
-        for key in reactionDict.keys():
-            reactionWeights[key] = 1
+        reactionWeights = dict.fromkeys(reactionDict, 1) # a new dictionary, so the default argument is not modified
     else: 
         assert reactionWeights.keys() == reactionDict.keys(), "reactionWeights and reactionKeys must have identical keys"
     #Setup
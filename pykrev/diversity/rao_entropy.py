@@ -0,0 +1,108 @@
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from ..formula.descriptors import descriptors
+def rao_entropy(msTuple, traits = ['HC','OC','NOSC','DBE','mz'], distance = 'gower', method = 'exact', memory_limit = 2**27, n_jobs = 1, n_pairs = 10**6, random_state = None):
+    """
+    Docstring for function pykrev.rao_entropy
+    ==========
+    Calculates Rao's quadratic entropy of an msTuple over a multi-trait distance between formula (functional diversity on several traits at once).
+
+    Use
+    ----------
+    rao_entropy(Y)
+
+    Returns a float, the sum over all pairs of formula i < j of p[i] * p[j] * d(i,j), where p are the sum normalised intensities
+    and d(i,j) is the distance between the traits of formula i and j. Returns nan if a trait of any formula is nan.
+
+    Parameters
+    ----------
+    Y: msTuple
+
+    traits: list, the traits of each formula. Each is 'mz' (the mz values of the msTuple) or any name accepted by pykrev.descriptors, e.g. 'HC', 'OC', 'NOSC', 'DBE', 'rAI', 'C'.
+
+    distance: String, the distance between formula, one of:
+        'gower' - the mean over traits of the absolute difference divided by the range of the trait.
+        'euclidean' - the euclidean distance between traits standardised to zero mean and unit standard deviation.
+
+    method: String, one of:
+        'exact' - sum over every pair of formula.
+        'approximate' - a Monte Carlo estimate from n_pairs pairs of formula, each formula drawn with probability p. For very large spectra.
+
+    memory_limit: int, the maximum number of bytes used for blocks of the pairwise distance matrix in 'exact' mode (per thread).
+
+    n_jobs: int, the number of threads used to compute blocks of the distance matrix in 'exact' mode.
+
+    n_pairs: int, the number of pairs drawn in 'approximate' mode.
+
+    random_state: int or numpy.random.Generator, the seed or generator used in 'approximate' mode.
+
+    Info
+    ----------
+    The sum is 0.5 * pᵀDp for the (N x N) distance matrix D, which is never held in memory: it is computed in square blocks of at most memory_limit bytes,
+    and only the blocks on and above the diagonal are computed as D is symmetric. Memory is O(N) plus the blocks, time is O(N^2 x traits).
+    The 'approximate' estimate is unbiased, with a standard error that decreases with the square root of n_pairs.
+    With a single trait, the 'gower' entropy multiplied by the range of the trait is the functional diversity of pykrev.diversity_indices.
+    See: "Rao, R. (1982). Diversity and dissimilarity coefficients: a unified approach." and "Gower, J. C. (1971). A general coefficient of similarity and some of its properties."
+    """
+    #Tests
+    assert distance in ['gower','euclidean'], "distance must be 'gower' or 'euclidean'"
+    assert method in ['exact','approximate'], "method must be 'exact' or 'approximate'"
+    assert n_jobs >= 1, 'n_jobs must be at least 1'
+    #Setup
+    formulaTraits = [trait for trait in traits if trait != 'mz']
+    table = descriptors(msTuple[0], names = formulaTraits)
+    columns = [np.asarray(msTuple[2], dtype = float) if trait == 'mz' else table[trait].to_numpy(dtype = float) for trait in traits]
+    X = np.column_stack(columns) if columns else np.zeros((len(msTuple[0]), 0))
+    intensity = np.asarray(msTuple[1], dtype = float)
+    assert len(intensity) == len(X), 'you must provide an intensity list (and an mz list to use the mz trait)'
+    if len(X) < 2:
+        return 0.0
+    if np.isnan(X).any():
+        return np.nan
+    p = intensity / np.nansum(intensity)
+    ## scale the traits so that the distance is a sum over traits of the scaled differences
+    if distance == 'gower':
+        spread = X.max(axis = 0) - X.min(axis = 0)
+    else:
+        spread = X.std(axis = 0)
+        X = X - X.mean(axis = 0)
+    X = X / np.where(spread > 0, spread, 1)
+    #Main
+    if method == 'approximate':
+        rng = np.random.default_rng(random_state)
+        first = rng.choice(len(p), size = n_pairs, p = p)
+        second = rng.choice(len(p), size = n_pairs, p = p)
+        return 0.5 * float(np.mean(_pair_distance(X[first], X[second], distance)))
+    block = max(1, int(np.sqrt(memory_limit / (3 * 8)))) # a block of distances and the difference being added to it
+    starts = range(0, len(p), block)
+    tiles = [(i, j) for i in starts for j in starts if j >= i]
+    def tile_sum(tile):
+        i, j = tile
+        D = _block_distance(X[i:i+block], X[j:j+block], distance)
+        total = p[i:i+block] @ D @ p[j:j+block]
+        # tiles on the diagonal hold each pair twice, tiles above it hold each pair once
+        return 0.5 * total if i == j else total
+    if n_jobs == 1:
+        return float(sum(tile_sum(tile) for tile in tiles))
+    with ThreadPoolExecutor(max_workers = n_jobs) as executor:
+        return float(sum(executor.map(tile_sum, tiles)))
+
+def _block_distance(A, B, distance):
+    """ The (len(A) x len(B)) matrix of distances between the rows of two blocks of scaled traits, accumulated one trait at a time. """
+    D = np.zeros((len(A), len(B)))
+    for k in range(A.shape[1]):
+        difference = A[:,k,None] - B[None,:,k]
+        if distance == 'gower':
+            np.abs(difference, out = difference)
+        else:
+            np.square(difference, out = difference)
+        D += difference
+    if distance == 'gower':
+        return D / max(A.shape[1], 1)
+    return np.sqrt(D, out = D)
+
+def _pair_distance(A, B, distance):
+    """ The distances between the rows A[i] and B[i] of two arrays of scaled traits. """
+    if distance == 'gower':
+        return np.abs(A - B).mean(axis = 1) if A.shape[1] > 0 else np.zeros(len(A))
+    return np.sqrt(((A - B)**2).sum(axis = 1))
@@ -0,0 +1,137 @@
+import operator
+import numpy as np
+from ..formula.descriptors import descriptors
+def register_compound_class(name, rules, mode = 'first', unmatched = 'Not matched', exclusive = [], fill = {}):
+    """
+    Docstring for function pykrev.register_compound_class
+    ==========
+    Registers a compound classification scheme, given as a table of rules, so that it can be used as a method of pykrev.compound_class.
+
+    Use
+    ----------
+    register_compound_class(name, rules)
+
+    After which compound_class(Y, method = name) classifies the formula of Y with the scheme. Returns None.
+
+    Parameters
+    ----------
+    name: String, the method name of the scheme. Registering an existing name replaces that scheme.
+
+    rules: list, the rule table. Each row is a tuple of (class name, list of conditions), a formula is in the class if it meets every condition of the row.
+        A class can be given in more than one row, a formula is then in the class if it meets the conditions of any of its rows.
+        Each condition is a tuple of (descriptor, operator, value), where operator is one of '<', '<=', '>', '>=', '==' or '!=' and descriptor is:
+        - any name accepted by pykrev.descriptors, e.g. an element count ('N'), an element ratio ('OC', 'HC'), 'rAI', 'DBE' or 'mass'
+        - 'mz', the mz values of the msTuple
+        e.g. [('Lipid-like', [('OC','>=',0.01), ('OC','<=',0.3), ('HC','>=',1.5), ('HC','<=',2.2)]), ...]
+
+    mode: String, how formula that meet the rules of more than one class are classified, one of:
+        'first' - the formula is assigned to the first class (in order of the rule table) that it matches.
+        'multiple' - the formula is assigned to 'Double matched: <first class> <second class>' and counted as 'Double matched'.
+
+    unmatched: String, the class of formula that do not match any class.
+
+    exclusive: list, class names that, in 'multiple' mode, are assigned on their own whenever they are matched (checked in the order given).
+
+    fill: dictionary, values used in place of nan descriptors before the rules are checked, e.g. {'NP': 0}.
+        Otherwise any comparison with nan (e.g. a ratio with a zero denominator) does not match.
+
+    Info
+    ----------
+    The built in 'MSCC', 'KELL' and 'FORM' methods of pykrev.compound_class are registered in the same format.
+    Each descriptor is computed once over the whole formula list and each condition is evaluated as a numpy mask.
+    """
+    #Tests
+    assert mode in ['first','multiple'], "mode must be 'first' or 'multiple'"
+    classes = list(dict.fromkeys(className for className, _ in rules))
+    assert all(className in classes for className in exclusive), 'exclusive classes must be in the rule table'
+    for _, conditions in rules:
+        for descriptor, op, value in conditions:
+            assert op in _OPERATORS, f"{op} is not a valid operator, use one of {list(_OPERATORS)}"
+    #Main
+    _SCHEMES[name] = {'rules': [(className, list(conditions)) for className, conditions in rules], 'classes': classes, 'mode': mode,
+                      'unmatched': unmatched, 'exclusive': list(exclusive), 'fill': dict(fill)}
+
+_OPERATORS = {'<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge, '==': operator.eq, '!=': operator.ne}
+_SCHEMES = dict()
+
+def _classify(msTuple, scheme):
+    """ Classify the formula of an msTuple with a registered scheme. Returns the list of classes and the dictionary of class counts. """
+    #Setup
+    formulaList = msTuple[0]
+    N = len(formulaList)
+    names = list(dict.fromkeys(descriptor for _, conditions in scheme['rules'] for descriptor, _, _ in conditions))
+    formulaNames = [name for name in names if name != 'mz']
+    if hasattr(msTuple, 'descriptors'):
+        table = msTuple.descriptors(formulaNames) # descriptors of the msTuple vocabulary are cached across calls
+    else:
+        table = descriptors(formulaList, names = formulaNames)
+    values = {name: table[name].to_numpy(dtype = float) for name in table.columns}
+    if 'mz' in names:
+        assert len(msTuple[2]) == N, 'to perform this classification you must provide a mass list'
+        values['mz'] = np.asarray(msTuple[2], dtype = float)
+    for name, fillValue in scheme['fill'].items():
+        if name in values:
+            values[name] = np.where(np.isnan(values[name]), fillValue, values[name])
+    classes = scheme['classes']
+    #Main
+    ## one row of classMask per class, true where a formula meets every condition of any row of that class
+    classMask = np.zeros((len(classes), N), dtype = bool)
+    with np.errstate(invalid = 'ignore'):
+        for className, conditions in scheme['rules']:
+            rowMask = np.ones(N, dtype = bool)
+            for descriptor, op, value in conditions:
+                rowMask &= _OPERATORS[op](values[descriptor], value)
+            classMask[classes.index(className)] |= rowMask
+    labels = np.array(classes + [scheme['unmatched']], dtype = object)
+    matched = classMask.any(axis = 0)
+    category = np.where(matched, classMask.argmax(axis = 0), len(classes))
+    double = np.zeros(N, dtype = bool)
+    if scheme['mode'] == 'multiple':
+        exclusiveMask = np.zeros(N, dtype = bool)
+        for className in scheme['exclusive']:
+            isClass = classMask[classes.index(className)] & ~exclusiveMask
+            category[isClass] = classes.index(className)
+            exclusiveMask |= isClass
+        remaining = classMask & ~exclusiveMask
+        remaining[[classes.index(className) for className in scheme['exclusive']]] = False
+        double = remaining.sum(axis = 0) > 1
+    compound_class = labels[category]
+    cclassCounts = dict(zip(labels.tolist(), np.bincount(category[~double], minlength = len(labels)).tolist()))
+    if scheme['mode'] == 'multiple':
+        ## formula matching more than one (non exclusive) class are labelled with their first two classes
+        doubleMask = remaining[:,double]
+        firstOfDouble = doubleMask.argmax(axis = 0)
+        doubleMask[firstOfDouble, np.arange(len(firstOfDouble))] = False
+        secondOfDouble = doubleMask.argmax(axis = 0)
+        compound_class[double] = 'Double matched: ' + labels[firstOfDouble] + ' ' + labels[secondOfDouble]
+        cclassCounts['Double matched'] = int(double.sum())
+    return compound_class.tolist(), cclassCounts
+
+register_compound_class('MSCC', [
+    ('Nucleotide', [('OC','>=',0.5), ('OC','<',1.7), ('HC','>',1), ('HC','<',1.8), ('NC','>=',0.2), ('NC','<=',0.5), ('PC','>=',0.1), ('PC','<=',0.35),
+                    ('NP','>',0.6), ('NP','<=',5), ('N','>=',2), ('P','>=',1), ('S','==',0), ('mz','>',305), ('mz','<',523)]),
+    ('Lipid', [('OC','<=',0.6), ('HC','>=',1.32), ('NC','<=',0.126), ('PC','<',0.35), ('NP','<=',5)]),
+    ('Carbohydrate', [('OC','>=',0.8), ('HC','>=',1.65), ('HC','<',2.7), ('N','==',0)]),
+    ('Amino-sugar', [('OC','>=',0.61), ('HC','>=',1.45), ('NC','<=',0.2), ('NC','>',0.07), ('PC','<',0.3), ('NP','<=',2), ('O','>=',3), ('N','>=',1)]),
+    ('Oxy-aromatic phytochemical', [('OC','<=',1.15), ('HC','<',1.32), ('NC','<',0.126), ('PC','<=',0.2), ('NP','<=',3)]),
+    ('Peptide', [('OC','>',0.12), ('OC','<=',0.6), ('HC','>',0.9), ('HC','<',2.5), ('NC','>=',0.126), ('NC','<=',0.7), ('PC','<',0.17), ('N','>=',1)]),
+    ('Peptide', [('OC','>',0.6), ('OC','<=',1), ('HC','>',1.2), ('HC','<',2.5), ('NC','>',0.2), ('NC','<=',0.7), ('PC','<',0.17), ('N','>=',1)]),
+    ], mode = 'multiple', unmatched = 'Not matched', exclusive = ['Nucleotide'], fill = {'NP': 0})
+
+register_compound_class('KELL', [
+    ('Combustion-derived polycyclic aromatics', [('rAI','>',0.66)]),
+    ('Vascular plant-derived polyphenols', [('rAI','>',0.5), ('rAI','<=',0.66)]),
+    ('Highly unsaturated and phenolic compounds', [('rAI','<=',0.5), ('HC','<',1.5)]),
+    ('Aliphatic compounds', [('rAI','<=',0.5), ('HC','>=',1.5)]),
+    ], mode = 'first', unmatched = 'Not matched')
+
+register_compound_class('FORM', [
+    ('Lipid-like', [('OC','>=',0.01), ('OC','<=',0.3), ('HC','>=',1.5), ('HC','<=',2.2)]),
+    ('Carbohydrate-like', [('OC','>=',0.7), ('OC','<=',1.1), ('HC','>=',1.5), ('HC','<=',2.3)]),
+    ('Unsaturated hydrocarbons', [('OC','>=',0.01), ('OC','<=',0.1), ('HC','>=',0.8), ('HC','<=',1.5)]),
+    ('Condensed aromatics', [('OC','>=',0.01), ('OC','<=',1), ('HC','>=',0.2), ('HC','<=',0.8)]),
+    ('Lignin-like', [('OC','>=',0.1), ('OC','<=',0.7), ('HC','>=',0.8), ('HC','<=',1.6)]),
+    ('Tannin-like', [('OC','>=',0.7), ('OC','<=',1.2), ('HC','>=',0.8), ('HC','<=',1.6)]),
+    ('Amino Sugar-like', [('OC','>=',0.6), ('OC','<=',0.7), ('HC','>=',1.5), ('HC','<=',2.2)]),
+    ('Peptide-like', [('OC','>=',0.3), ('OC','<=',0.6), ('HC','>=',1.5), ('HC','<=',2.3)]),
+    ], mode = 'first', unmatched = 'Not assigned')
@@ -1,16 +1,24 @@
 from .aromaticity_index import aromaticity_index 
 from .double_bond_equivalent import double_bond_equivalent 
 from .element_counts import element_counts
+from .element_matrix import element_matrix
+from .formula_cache import formula_cache_info, clear_formula_cache, configure_formula_cache
+from .descriptors import descriptors
 from .element_ratios import element_ratios
 from .nominal_oxidation_state import nominal_oxidation_state
 from .find_intersections import find_intersections
-from .read_formularity import read_formularity
+from .read_formularity import read_formularity, iter_formularity
 from .read_batch_formularity import read_batch_formularity
 from .calculate_mass import calculate_mass
 from .kendrick_mass_defect import kendrick_mass_defect
 from .filter_spectral_interference import filter_spectral_interference
-from .read_corems import read_corems
+from .read_corems import read_corems, iter_corems
 from .msTuple import msTuple
+from .msQuery import msQuery
+from .formula_vocabulary import FormulaVocabulary, CodedFormula
 from .msTupleDict import msTupleDict
+from .msTupleStore import msTupleStore
 from .average_mstuple import average_mstuple
-from .read_csv import read_csv
\ No newline at end of file
+from .read_csv import read_csv, iter_csv
+from .read_directory import read_directory
+from .read_npz import read_npz
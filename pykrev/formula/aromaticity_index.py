@@ -1,4 +1,4 @@
-from .element_counts import element_counts
+from .element_matrix import element_matrix, _element_columns
 import numpy as np
 def aromaticity_index(msTuple, index_type = 'rAI'):     
     """ 
@@ -28,25 +28,32 @@ def aromaticity_index(msTuple, index_type = 'rAI'):
     Reformulated aromaticity index see Mendelez-Perez et al. (2016): 
     "A reformulated aromaticity index equation under consideration for non-aromatic and non-condensed aromatic cyclic carbonyl compounds."
     Aromaticity index see Koch and Dittmar (2006): From mass to structure: an aromaticity index for high-resolution mass data of natural organic matter"
+    If the denominator of the index is zero, np.nan is returned.
     """ 
     # Tests   
     assert index_type in ['rAI','rAImod','AI','AImod'], 'supply a valid index type, read doc string for more info'
     # Setup
-    count_list = element_counts(msTuple)
-    AI_array = np.array([])
+    countMatrix, elementIndex = element_matrix(msTuple)
+    count = _element_columns(countMatrix, elementIndex)
     # Main
-    for count in count_list: 
-        try:
-            if index_type == 'rAImod':
-                AI_counts = (1 + 1/2*((count['C']*2)-count['H']-count['Cl']-count['F']-(count['O']*1)-(count['S']*2)-count['N']-count['P']))/count['C']
-            elif index_type == 'rAI':
-                AI_counts = (1 + 1/2*((count['C']*2)-count['H']-count['Cl']-count['F']-(count['O']*2)-(count['S']*2)-count['N']-count['P']))/count['C']
-            elif index_type == 'AImod':
-                AI_counts = (1 + count['C']-(count['Cl']*0.5)-(count['F']*0.5)-(count['H']*0.5)-(count['O']*0.5)-count['S'])/(count['C'] - (count['O']*0.5) - count['N'] - count['S'] - count['P'])
-            elif index_type == 'AI':
-                AI_counts = (1 + count['C']-count['O']-count['S']-(count['Cl']*0.5)-(count['F']*0.5)-(count['H']*0.5))/(count['C'] - count['O'] - count['N'] - count['S'] - count['P'])
-        except ZeroDivisionError:
-            AI_counts = np.nan
-            print(f"Warning Zero Division Encountered, NaN value returned. {count}")
-        AI_array = np.append(AI_array,AI_counts)
+    AI_array = _aromaticity_index(count, index_type)
+    return AI_array
+
+def _aromaticity_index(count, index_type):
+    """ Compute the aromaticity index over whole count columns. Zero denominators give np.nan. """
+    if index_type == 'rAImod':
+        numerator = 1 + 1/2*((count['C']*2)-count['H']-count['Cl']-count['F']-(count['O']*1)-(count['S']*2)-count['N']-count['P'])
+        denominator = count['C']
+    elif index_type == 'rAI':
+        numerator = 1 + 1/2*((count['C']*2)-count['H']-count['Cl']-count['F']-(count['O']*2)-(count['S']*2)-count['N']-count['P'])
+        denominator = count['C']
+    elif index_type == 'AImod':
+        numerator = 1 + count['C']-(count['Cl']*0.5)-(count['F']*0.5)-(count['H']*0.5)-(count['O']*0.5)-count['S']
+        denominator = count['C'] - (count['O']*0.5) - count['N'] - count['S'] - count['P']
+    elif index_type == 'AI':
+        numerator = 1 + count['C']-count['O']-count['S']-(count['Cl']*0.5)-(count['F']*0.5)-(count['H']*0.5)
+        denominator = count['C'] - count['O'] - count['N'] - count['S'] - count['P']
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        AI_array = numerator/denominator
+    AI_array[denominator == 0] = np.nan
     return AI_array
@@ -1,6 +1,7 @@
 import numpy as np
 from .calculate_mass import calculate_mass
 from .msTuple import msTuple
+from .formula_vocabulary import _encode_samples, _scatter_samples
 def average_mstuple(Y, intensityMethod = 'mean', mzMethod = 'mean', minOccurrence = 1, zeroValues = True, stdDev = False):
     """ 
     Docstring for function pykrev.average_mstuple
@@ -44,65 +45,41 @@ def average_mstuple(Y, intensityMethod = 'mean', mzMethod = 'mean', minOccurrenc
     assert mzMethod in ['mean','median', 'monoisotopic'], "You must provide a valid method"
     assert minOccurrence > 0, "minOccurrence must be at least 1"
     #Setup
-    OrdinationMat = Y.to_OrdinationMatrix(impute_value = 0)
-    row,col = OrdinationMat.shape
-    formulaNames = OrdinationMat.columns
-    outputFormula = []
-    outputIntensity = []
-    outputMZ  = []
-    stdDevIntensity = []
-    stdDevMZ = []
+    vocabulary, sampleCodes = _encode_samples(Y)
+    sampleCodes = list(sampleCodes.values())
+    ## (samples x formula) matrices of intensity (0 if the formula is missing) and mz (nan if the formula is missing)
+    intensityMat, formulaCodes = _scatter_samples(sampleCodes, (v.intensity for v in Y.values()), len(vocabulary), fill = 0)
+    mzMat, _ = _scatter_samples(sampleCodes, (v.mz for v in Y.values()), len(vocabulary), fill = np.nan)
     #Main
-    for i in range(col):
-        ##Test whether Occurrence matches min Occurrence
-        nonZeroIdx = OrdinationMat.iloc[:,i].to_numpy().nonzero()[0]
-        occurrence = len(nonZeroIdx)
-        if occurrence >= minOccurrence:
-            ## Remove or keep zero values
-            if zeroValues == True:
-                testArray = OrdinationMat.iloc[:,i].to_numpy()
-            elif zeroValues == False:
-                testArray = OrdinationMat.iloc[:,i].to_numpy()[nonZeroIdx]
-            ## Perform the averaging
-            if intensityMethod == 'mean':
-                outputIntensity.append(testArray.mean())
-            elif intensityMethod == 'max':
-                outputIntensity.append(testArray.max())                
-            elif intensityMethod == 'sum':
-                outputIntensity.append(testArray.sum())
-            formula = formulaNames[i]
-            outputFormula.append(formula)
-            ## Determine the mz across spectra where this formula was found 
-            if mzMethod == 'monoisotopic':
-                outputMZ.append(calculate_mass(formula))
-            mzArray = np.array([])
-            for v in Y.values():
-                try:
-                    idx = v.formula.index(formula)
-                except ValueError:
-                    continue
-                mzArray = np.append(mzArray,v.mz[idx])
-            if mzMethod == 'mean':
-                outputMZ.append(mzArray.mean())
-            elif mzMethod == 'median':
-                outputMZ.append(mzArray.median())
-            ## Determine the standard deviations
-            if stdDev == True:
-                stdDevIntensity.append(testArray.std(ddof = 1))
-                stdDevMZ.append(mzArray.std(ddof = 1))
+    ##Test whether Occurrence matches min Occurrence
+    nonZero = intensityMat != 0
+    keep = nonZero.sum(axis = 0) >= minOccurrence
+    intensityMat = intensityMat[:,keep]
+    mzMat = mzMat[:,keep]
+    outputFormula = vocabulary.decode(formulaCodes[keep])
+    ## Remove or keep zero values
+    if zeroValues == False:
+        intensityMat = np.where(nonZero[:,keep], intensityMat, np.nan)
+    ## Perform the averaging
+    if intensityMethod == 'mean':
+        outputIntensity = np.nanmean(intensityMat, axis = 0)
+    elif intensityMethod == 'max':
+        outputIntensity = np.nanmax(intensityMat, axis = 0)
+    elif intensityMethod == 'sum':
+        outputIntensity = np.nansum(intensityMat, axis = 0)
+    ## Determine the mz across spectra where this formula was found
+    if mzMethod == 'monoisotopic':
+        outputMZ = calculate_mass(outputFormula)
+    elif mzMethod == 'mean':
+        outputMZ = np.nanmean(mzMat, axis = 0)
+    elif mzMethod == 'median':
+        outputMZ = np.nanmedian(mzMat, axis = 0)
     assert len(outputIntensity) == len(outputMZ) == len(outputFormula)
-    outputMZ = np.array(outputMZ)
-    outputIntensity = np.array(outputIntensity)
     if stdDev == True:
+        ## Determine the standard deviations
+        stdDevIntensity = list(np.nanstd(intensityMat, axis = 0, ddof = 1))
+        stdDevMZ = list(np.nanstd(mzMat, axis = 0, ddof = 1))
         assert len(outputIntensity) == len(stdDevIntensity)
         return msTuple(outputFormula, outputIntensity, outputMZ), (stdDevIntensity, stdDevMZ)
     else:
         return msTuple(outputFormula, outputIntensity, outputMZ)
-
-
-
-
-            
-
-
-
@@ -1,53 +1,107 @@
+import re
 import numpy as np
-from .element_counts import element_counts
-def calculate_mass(msTuple, method = 'monoisotopic', protonated = False, ion_charge = 0):     
-    """ 
+from .element_matrix import element_matrix, _TOKEN
+_ISOTOPE_MASSES = {'2H': 2.01410177812, '13C': 13.00335483507, '15N': 15.00010889888, '17O': 16.99913175650, '18O': 17.99915961286,
+                   '33S': 32.97145890986, '34S': 33.967867004, '37Cl': 36.965902602, '81Br': 80.9162897, '41K': 40.96182525793,
+                   '29Si': 28.97649466525, '30Si': 29.973770136}
+ELEMENT_MASSES = {
+    'monoisotopic': {'C': 12.0, 'H': 1.007825032239, 'O':15.9949146195717,'N': 14.003074004432,'S': 31.972071174414, 'P': 30.973761998427, 'Cl': 34.96885268237, 'F': 18.9984031627392,
+                     'Na': 22.989769282, 'K': 38.9637064864, 'Br': 78.9183376, 'I': 126.9044719, 'Si': 27.976926535, **_ISOTOPE_MASSES},
+    'nominal': {'C': 12, 'H': 1, 'O':16,'N': 14,'S': 32, 'P': 31, 'Cl':35, 'F':19,
+                'Na': 23, 'K': 39, 'Br': 79, 'I': 127, 'Si': 28, **{isotope: int(re.match(r'\d+', isotope).group()) for isotope in _ISOTOPE_MASSES}},
+    'average': {'C': 12.010736, 'H': 1.007941, 'O':15.999405,'N': 14.006743,'S': 32.066085, 'P': 30.973762, 'Cl': 35.452938, 'F': 18.998403,
+                'Na': 22.98976928, 'K': 39.0983, 'Br': 79.904, 'I': 126.90447, 'Si': 28.0855, **_ISOTOPE_MASSES},
+}
+ELECTRON_MASS = 0.0005485
+def calculate_mass(msTuple, method = 'monoisotopic', protonated = False, ion_charge = 0, ions = []):
+    """
 	Docstring for function pyKrev.calculate_mass
 	==========
 	This function takes an msTuple and calculates the monoisotopic, nominal or average mass of each formula in the formula list.
-    
+
 	Use
 	----------
 	calculate_mass(Y)
-    
+
 	Returns a numpy array of len(Y[0]) in which each item , i , is the calculated mass of Y[0][i].
-    
+    If ions are given, returns a numpy array of shape (len(Y[0]), len(ions)) in which the [i,j] value is the m/z of Y[0][i] as the ion ions[j].
+
 	Parameters
 	----------
 	Y: msTuple OR a list of molecular formula strings
-    
+
     Method: String, the type of mass calculation to perform. One of:
-        - 'monoisotopic', i.e. based on the exact mass of the most abundant isotope. 
+        - 'monoisotopic', i.e. based on the exact mass of the most abundant isotope.
         - 'nominal', i.e. the mass of the most abundant isotope rounded to the nearest integer.
         - 'average', i.e. mass taking into account weighted abundance of all natural isotopes of the element.
+        OR a dictionary containing element symbols (or isotopes e.g. '13C') as keys and their masses as values.
 
     protonated: Boolean, if True calculate mass for close shell ions([M + H]+  or [M - H]-) depending on ion_charge
 
-    ion_charge: int, the ion charge of the formula, if not charged == 0 
+    ion_charge: int, the ion charge of the formula, if not charged == 0
+
+    ions: list of ion definition strings, e.g. ['[M-H]-','[M+H]+','[M+Na]+','[M+Cl]-','[M-2H]2-','[2M-H]-'], or '[M]' (or '[2M]') for the neutral molecule.
+        Ions with adducts must end with their charge sign.
+        If given, protonated and ion_charge are ignored and the m/z of every formula is calculated for every ion.
 
 	Info
 	----------
     average masses taken from: http://physics.nist.gov/PhysRefData/Compositions/.
     monoisotopic masses taken from CoreMS python library.
+    Na, K, Br, I, Si and isotope masses ('2H','13C','15N','17O','18O','33S','34S','37Cl','81Br','41K','29Si','30Si') taken from NIST.
+    Isotopes are counted when written with their mass number e.g. C9H12O6 13C1. Elements without a mass in the table are ignored.
+    Masses are calculated as a single matrix product between the element count matrix (see pykrev.element_matrix) and the element mass vector.
     """
-    #Setup 
-    count_list = element_counts(msTuple)
-    electron_mass = 0.0005485
-    if method == 'monoisotopic':
-        element_masses = {'C': 12.0, 'H': 1.007825032239, 'O':15.9949146195717,'N': 14.003074004432,'S': 31.972071174414, 'P': 30.973761998427, 'Cl': 34.96885268237, 'F': 18.9984031627392}
-    elif method == 'nominal':
-        element_masses = {'C': 12, 'H': 1, 'O':16,'N': 14,'S': 32, 'P': 31, 'Cl':35, 'F':19}
-    elif method == 'average':
-        element_masses = {'C': 12.010736, 'H': 1.007941, 'O':15.999405,'N': 14.006743,'S': 32.066085, 'P': 30.973762, 'Cl': 35.452938, 'F': 18.998403}
+    #Setup
+    if isinstance(method, dict):
+        element_masses = method
+    elif method in ELEMENT_MASSES:
+        element_masses = ELEMENT_MASSES[method]
     else:
         raise Exception("Method not recognised.")
-    mass_list = np.empty(len(count_list))
+    if protonated == True and ion_charge != 0 and len(ions) == 0:
+        assert 'H' in element_masses, 'to calculate the mass of protonated ions, provide a mass for H'
+    countMatrix, elementIndex = element_matrix(msTuple, elements = list(element_masses))
     #Main
-    for i in range(0,len(count_list)):
-        mass_list[i] = count_list[i]['C'] * element_masses['C'] + count_list[i]['H'] * element_masses['H'] + count_list[i]['N'] * element_masses['N'] + count_list[i]['O'] * element_masses['O'] + count_list[i]['P'] * element_masses['P'] + count_list[i]['S'] * element_masses['S'] + count_list[i]['Cl'] * element_masses['Cl'] + count_list[i]['F'] * element_masses['F']
-        if ion_charge != 0: 
-            mass_list[i] += (ion_charge * -1 * electron_mass)
-            if protonated == True:
-                mass_list[i] += (ion_charge * element_masses['H'])
-            mass_list[i] = mass_list[i]/abs(ion_charge)
+    mass_list = _formula_mass(countMatrix, elementIndex, element_masses)
+    if len(ions) > 0:
+        return _ion_mass(mass_list, ions, element_masses)
+    if ion_charge != 0:
+        mass_list += (ion_charge * -1 * ELECTRON_MASS)
+        if protonated == True:
+            mass_list += (ion_charge * element_masses['H'])
+        mass_list = mass_list/abs(ion_charge)
     return mass_list
+
+def _formula_mass(countMatrix, elementIndex, element_masses):
+    """ Compute the mass of each row of a count matrix as a single matrix product with the element mass vector. """
+    mass_vector = np.array([element_masses[el] for el in elementIndex], dtype = float)
+    return countMatrix @ mass_vector
+
+_ION = re.compile(r'^\[(\d*)M((?:[+-]\d*[A-Z][A-Za-z0-9]*)*)\](\d*)([+-]?)$')
+_ADDUCT = re.compile(r'([+-])(\d*)([A-Z][A-Za-z0-9]*)')
+def _parse_ion(ion, element_masses):
+    """ Parse an ion definition e.g. '[2M+Na]+' into the number of molecules, the total adduct mass and the signed charge. """
+    match = _ION.match(ion.replace(' ',''))
+    assert match is not None, f'{ion} is not a valid ion definition, use the form [M-H]-, [M+Na]+ or [M-2H]2-'
+    molecules, adducts, charge, sign = match.groups()
+    assert sign != '' or (adducts == '' and charge == ''), f'{ion} has no charge sign, use the form [M+H]+ or [M-2H]2- ([M] for the neutral molecule)'
+    molecules = int(molecules) if molecules else 1
+    charge = (int(charge) if charge else 1) * {'+': 1, '-': -1, '': 0}[sign]
+    adduct_mass = 0.0
+    for adduct_sign, multiplier, formula in _ADDUCT.findall(adducts):
+        # element_matrix ignores elements it has no column for, so an adduct element without a mass would be silently dropped
+        missing = [isotope + element for isotope, element, _ in _TOKEN.findall(formula) if isotope + element not in element_masses]
+        assert len(missing) == 0, f'no mass available for elements of {ion}: {missing}'
+        countMatrix, elementIndex = element_matrix([formula], elements = list(element_masses))
+        mass = _formula_mass(countMatrix, elementIndex, element_masses)[0] * (int(multiplier) if multiplier else 1)
+        adduct_mass += mass if adduct_sign == '+' else -mass
+    return molecules, adduct_mass, charge
+
+def _ion_mass(mass_list, ions, element_masses):
+    """ Compute the m/z of every neutral mass in mass_list for every ion definition in ions, returns an array of shape (len(mass_list), len(ions)). """
+    parsed = np.array([_parse_ion(ion, element_masses) for ion in ions], dtype = float).reshape(len(ions), 3)
+    molecules, adduct_mass, charge = parsed.T
+    offset = adduct_mass - charge * ELECTRON_MASS
+    divisor = np.where(charge == 0, 1, np.abs(charge))
+    return (np.outer(mass_list, molecules) + offset)/divisor
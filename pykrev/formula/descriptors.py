@@ -0,0 +1,80 @@
+import re
+import pandas as pd
+from .element_matrix import element_matrix, _element_columns, ELEMENTS
+from .element_ratios import _split_ratio, _element_ratio
+from .aromaticity_index import _aromaticity_index
+from .double_bond_equivalent import _double_bond_equivalent
+from .nominal_oxidation_state import _nominal_oxidation_state
+from .calculate_mass import _formula_mass, ELEMENT_MASSES
+def descriptors(msTuple, names = ['rAI','AImod','DBE','NOSC','HC','OC','mass'], elements = ELEMENTS):
+    """
+    Docstring for function pykrev.descriptors
+    ==========
+    This function takes an msTuple and computes several formula descriptors in a single call.
+
+    Use
+    ----------
+    descriptors(Y)
+
+    Returns a pandas.DataFrame of len(Y[0]) rows with one column per descriptor in names, in which row i corresponds to Y[0][i].
+
+    Parameters
+    ----------
+    Y: msTuple OR a list of molecular formula strings
+
+    names: list, the descriptors to compute. Each item is one of:
+        - an element symbol (e.g. 'C', 'N', 'Cl'), the atom count of that element
+        - an element ratio (e.g. 'HC', 'OC', 'NC'), calculated as first element / second element. See pykrev.element_ratios
+        - 'rAI', 'rAImod', 'AI' or 'AImod', the aromaticity index. See pykrev.aromaticity_index
+        - 'DBE', the double bond equivalent. See pykrev.double_bond_equivalent
+        - 'NOSC', the nominal oxidation state of C. See pykrev.nominal_oxidation_state
+        - 'mass', 'nominal mass' or 'average mass', the neutral formula mass. 'mass' is the monoisotopic mass. See pykrev.calculate_mass
+
+    elements: list, the element alphabet used to parse the formula. Elements named in names are added automatically.
+        Masses are calculated over the elements of the mass table, as in pykrev.calculate_mass, whatever the alphabet.
+
+    Info
+    ----------
+    The formula list is parsed once (see pykrev.element_matrix) and each descriptor is computed over the whole count matrix.
+    Descriptors with a zero denominator (e.g. ratios, aromaticity index, NOSC) are returned as np.nan.
+    """
+    #Tests
+    assert len(set(names)) == len(names), 'names must not contain duplicates'
+    #Setup
+    elements = list(elements)
+    ratios = dict()
+    for name in names:
+        if name in _DESCRIPTORS:
+            continue
+        if _ELEMENT.match(name):
+            required = [name]
+        else:
+            ratios[name] = _split_ratio(name)
+            required = ratios[name]
+        elements += [el for el in required if el not in elements]
+    countMatrix, elementIndex = element_matrix(msTuple, elements = elements)
+    count = _element_columns(countMatrix, elementIndex)
+    table = pd.DataFrame(index = range(len(countMatrix)))
+    #Main
+    for name in names:
+        if name in ['rAI','rAImod','AI','AImod']:
+            table[name] = _aromaticity_index(count, name)
+        elif name == 'DBE':
+            table[name] = _double_bond_equivalent(count)
+        elif name == 'NOSC':
+            table[name] = _nominal_oxidation_state(count)
+        elif name in ['mass','nominal mass','average mass']:
+            # masses are computed on their own count matrix over the mass table, as in calculate_mass, so that the elements of the mass table
+            # do not change the alphabet of the other descriptors (e.g. halogens counted by DBE)
+            element_masses = ELEMENT_MASSES[_MASS_METHODS[name]]
+            massMatrix, massIndex = element_matrix(msTuple, elements = list(element_masses))
+            table[name] = _formula_mass(massMatrix, massIndex, element_masses)
+        elif name in ratios:
+            table[name] = _element_ratio(count, *ratios[name])
+        else:
+            table[name] = countMatrix[:,elementIndex[name]]
+    return table
+
+_ELEMENT = re.compile(r'^\d*[A-Z][a-z]?$')
+_MASS_METHODS = {'mass': 'monoisotopic', 'nominal mass': 'nominal', 'average mass': 'average'}
+_DESCRIPTORS = ['rAI','rAImod','AI','AImod','DBE','NOSC'] + list(_MASS_METHODS)
@@ -1,4 +1,4 @@
-from .element_counts import element_counts
+from .element_matrix import element_matrix, _element_columns
 import numpy as np
 def double_bond_equivalent(msTuple):
     """ 
@@ -26,18 +26,14 @@ def double_bond_equivalent(msTuple):
 	where: C = number of carbon atoms, H = number of hydrogen and halogen atoms, and N = number of nitrogen atoms.
     """    
     #Setup
-    count_list = element_counts(msTuple)
-    DBE_array = np.array([])
+    countMatrix, elementIndex = element_matrix(msTuple)
+    count = _element_columns(countMatrix, elementIndex)
     #Main
-    for count in count_list:
-        Halogens = ['H','Cl','Br','I','F','At','Ts']
-        Hal = 0 
-        for el in Halogens: 
-            try:
-                Hal += count[el]
-            except KeyError:
-                pass 
-            
-        DBE_counts = count['C'] - (Hal/2) + (count['N']/2) + 1 
-        DBE_array = np.append(DBE_array,DBE_counts)        
-    return DBE_array
\ No newline at end of file
+    DBE_array = _double_bond_equivalent(count)
+    return DBE_array
+
+def _double_bond_equivalent(count):
+    """ Compute the double bond equivalent over whole count columns. """
+    Halogens = ['H','Cl','Br','I','F','At','Ts']
+    Hal = sum(count[el] for el in Halogens)
+    return count['C'] - (Hal/2) + (count['N']/2) + 1
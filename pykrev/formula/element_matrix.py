@@ -0,0 +1,86 @@
+import re
+import numpy as np
+from .formula_cache import _formula_cache
+ELEMENTS = ['C','H','N','O','P','S','Cl','F']
+#an element token is an optional isotope mass number, an element symbol and an optional atom count e.g. C10, Cl, 13C1
+_TOKEN = re.compile(r'(\d*)([A-Z][a-z]?)(\d*)')
+def element_matrix(msTuple, elements = ELEMENTS, dtype = np.int16):
+    """
+    Docstring for function pykrev.element_matrix
+    ==========
+    This function takes an msTuple and gives atomic counts for each formula in the formula list as an integer matrix.
+
+    Use
+    ----------
+    element_matrix(Y)
+
+    Returns a tuple containing (i) a numpy.ndarray of shape (len(Y[0]), len(elements)) in which the [i,j] value is the number of atoms of elements[j] in Y[0][i]
+    and (ii) a dictionary mapping each element to its column index in the matrix.
+
+    Parameters
+    ----------
+    Y: msTuple OR a list of molecular formula strings.
+
+    elements: list, the element alphabet i.e. the columns of the matrix. Any element symbol can be given (e.g. 'Br', 'I', 'Na', 'Si'),
+        isotopes are given with their mass number (e.g. '13C', '34S'). Elements found in a formula but missing from the alphabet are ignored.
+
+    dtype: numpy integer type used to store the counts.
+
+    Info
+    ----------
+    Each formula is tokenised in a single pass and each unique formula is only parsed once per call.
+    Parsed formula are kept in a process wide cache so that they are not parsed again by later calls, see pykrev.formula_cache_info and pykrev.configure_formula_cache.
+    Element counts are summed if an element appears more than once in a formula (e.g. CH3COOH).
+    Isotopes are written as a mass number followed by the element symbol, separated from the rest of the formula by a space (e.g. C9H12O6 13C1).
+    """
+    #Tests
+    assert len(set(elements)) == len(elements), 'elements must not contain duplicates'
+    #Setup
+    if isinstance(msTuple, tuple):
+        formula_list = msTuple[0]
+    else:
+        formula_list = msTuple
+    elementIndex = {element: i for i, element in enumerate(elements)}
+    alphabet = tuple(elements)
+    useCache = _formula_cache.enabled
+    uniqueIndex = dict()
+    rows = []
+    codes = np.empty(len(formula_list), dtype = np.intp)
+    #Main
+    for i, formula in enumerate(formula_list):
+        code = uniqueIndex.get(formula)
+        if code is None:
+            code = uniqueIndex[formula] = len(rows)
+            row = _formula_cache.get((alphabet, formula)) if useCache else None
+            if row is None:
+                row = tuple(_parse_formula(formula, elementIndex))
+                if useCache:
+                    _formula_cache.put((alphabet, formula), row)
+            rows.append(row)
+        codes[i] = code
+    countMatrix = np.array(rows, dtype = dtype).reshape(len(rows), len(elements))
+    return countMatrix[codes], elementIndex
+
+def _parse_formula(formula, elementIndex):
+    """ Tokenise a single formula string and return a list of atom counts ordered by elementIndex. """
+    row = [0] * len(elementIndex)
+    for isotope, element, number in _TOKEN.findall(formula):
+        column = elementIndex.get(isotope + element)
+        if column is not None:
+            row[column] += int(number) if number else 1
+    return row
+
+def _element_columns(countMatrix, elementIndex):
+    """ Return a dictionary of float count columns keyed by element. Elements missing from elementIndex are returned as zero columns. """
+    columns = _ZeroColumns(len(countMatrix))
+    for element, j in elementIndex.items():
+        columns[element] = countMatrix[:,j].astype(float)
+    return columns
+
+class _ZeroColumns(dict):
+    def __init__(self, length):
+        super().__init__()
+        self.length = length
+
+    def __missing__(self, element):
+        return np.zeros(self.length)
@@ -1,5 +1,6 @@
+import re
 import numpy as np
-from .element_counts import element_counts
+from .element_matrix import element_matrix, _element_columns, ELEMENTS
 def element_ratios(msTuple, ratios = ['OC','HC']):
         
     """ 
@@ -12,8 +13,7 @@ def element_ratios(msTuple, ratios = ['OC','HC']):
 	element_ratios(Y)
     
 	Returns a list of len(Y) in which each item is a dictionary containing the atomic ratios listed in ratios, 
-	calculated as the first element / second element. If the second element is zero, a nan or zero value is returned
-    depending on zero_ratio.
+	calculated as the first element / second element. If the second element is zero, a nan value is returned.
     
 	Parameters
 	----------
@@ -23,24 +23,28 @@ def element_ratios(msTuple, ratios = ['OC','HC']):
         
     """
     #Tests
-    for ratio in ratios:
-        assert len(ratio) < 4 and len(ratio) > 1, 'Too many or too few characters in the ratio'
+    ratio_elements = [_split_ratio(ratio) for ratio in ratios]
     #Setup
-    count_list = element_counts(msTuple)
-    ratio_list = []
+    elements = list(ELEMENTS)
+    for pair in ratio_elements:
+        elements += [el for el in pair if el not in elements]
+    countMatrix, elementIndex = element_matrix(msTuple, elements = elements)
+    count = _element_columns(countMatrix, elementIndex)
     #Main
-    for count in count_list:
-        ratio_counts = dict()
-        for ratio in ratios:
-            # we need to set the second index to 2 if chlorine is the first element in the ratio  as it has two characters in the element name
-            if 'Cl' in ratio and ratio.index('Cl') == 0:
-                sidx = 2
-            else:
-                sidx = 1
-            # this if statement checks for division by zero and sets value to nan if so
-            if count[ratio[sidx]] == 0:
-                    ratio_counts[ratio] = np.nan
-            else:
-                ratio_counts[ratio] = count[ratio[0:sidx]]/count[ratio[sidx::]]
-        ratio_list.append(ratio_counts)    
-    return ratio_list
\ No newline at end of file
+    ratio_columns = [_element_ratio(count, numerator, denominator) for numerator, denominator in ratio_elements]
+    ratio_list = [dict(zip(ratios, row)) for row in np.array(ratio_columns, dtype = float).reshape(len(ratios), len(countMatrix)).T.tolist()]
+    return ratio_list
+
+_RATIO = re.compile(r'^(\d*[A-Z][a-z]?)(\d*[A-Z][a-z]?)$')
+def _split_ratio(ratio):
+    """ Split a ratio string (e.g. 'HC' or 'ClC') into its numerator and denominator element. """
+    match = _RATIO.match(ratio)
+    assert match is not None, f'{ratio} is not a valid ratio, provide two element symbols e.g. HC'
+    return match.groups()
+
+def _element_ratio(count, numerator, denominator):
+    """ Compute an element ratio over whole count columns. Zero denominators give np.nan. """
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        ratio = count[numerator]/count[denominator]
+    ratio[count[denominator] == 0] = np.nan
+    return ratio
@@ -1,6 +1,6 @@
 import numpy as np
 from .msTuple import msTuple
-def filter_spectral_interference(msTupleObj, tol = 2 , verbose = True):
+def filter_spectral_interference(msTupleObj, tol = 2 , verbose = True, return_pairs = False):
     """ 
 	Docstring for function pykrev.filter_spectral_interference
 	====================
@@ -10,42 +10,63 @@ def filter_spectral_interference(msTupleObj, tol = 2 , verbose = True):
 	----
 	filter_spectral_interference(Y)
     
-	Returns an msTuple containing filtered arrays.
+	Returns an msTuple containing filtered arrays. 
+    If return_pairs is True, returns a tuple containing (i) the filtered msTuple and (ii) a numpy array of shape (K,2) in which each row contains
+    the index of a suspected doubly charged peak and the index of its monoisotopic peak in Y.
     
 	Parameters
 	----------
     Y: msTuple
     tol: Integer of float,the tolerance (in ppm) used to identify monoisotopic 
     verbose: Booloean, print text to the console.
+    return_pairs: Boolean, if True also return the interference pairs.
 
     Info
     -----------
     For more information on this algorithm refer to Patriarca, Claudia, and Jeffrey A. Hawkes. 
     "High Molecular Weight Spectral Interferences in Mass Spectra of Dissolved Organic Matter." 
     Journal of the American Society for Mass Spectrometry (2020).
+    Monoisotopic peaks are found with a binary search of the sorted mz values, so the filter runs in O(N log N).
     """    
     #Setup
-    mass_list = msTupleObj[2]
-    formula_list = np.array(msTupleObj[0])
-    peak_intensities = msTupleObj[1]
-    mass_defect = mass_list - np.floor(mass_list)
-    c13d2 = (13.00335-12)/2
-    flags = np.zeros(len(mass_list))
+    mass_list = np.asarray(msTupleObj[2])
+    formula_list = msTupleObj[0]
+    peak_intensities = np.asarray(msTupleObj[1])
     #Main
-    for i in range(0,len(mass_list)):
-        if mass_defect[i] > 0.4 and mass_defect[i] < 0.8:
-            flags[i] = 1
-            mono_mass = mass_list[i] - c13d2
-            mass_diff = abs(mass_list - mono_mass)
-            mono_pos = mass_diff == min(mass_diff)
-            if min(mass_diff)/mass_list[i] * 1e6 < tol:
-                if peak_intensities[mono_pos]/peak_intensities[i] < 10:
-                    flags[mono_pos] = 2
-    spectralFilter = flags == 0 
-    filter_mass = mass_list[spectralFilter]
-    filter_formula = formula_list[spectralFilter]
-    filter_peak_intensities = peak_intensities[spectralFilter]
+    flags, pairs = _spectral_interference(mass_list, peak_intensities, tol)
+    keep = np.nonzero(flags == 0)[0]
+    filter_mass = mass_list[keep]
+    filter_formula = [formula_list[i] for i in keep]
+    filter_peak_intensities = peak_intensities[keep]
     if verbose == True:
         print(f"{len(mass_list)-len(filter_mass)} interferences removed.")
-    filter_formula = list(filter_formula) #reconvert filter_formula to list to sort out data type issue
-    return msTuple(filter_formula, filter_peak_intensities, filter_mass)
\ No newline at end of file
+    if return_pairs == True:
+        return msTuple(filter_formula, filter_peak_intensities, filter_mass), pairs
+    return msTuple(filter_formula, filter_peak_intensities, filter_mass)
+
+def _spectral_interference(mass_list, peak_intensities, tol):
+    """ Flag suspected doubly charged interferences (1) and their monoisotopic peaks (2).
+        Returns the flag array and an array of shape (K,2) of [interference index, monoisotopic index] pairs. """
+    mass_defect = mass_list - np.floor(mass_list)
+    c13d2 = (13.00335-12)/2
+    flags = np.zeros(len(mass_list))
+    candidates = np.nonzero((mass_defect > 0.4) & (mass_defect < 0.8))[0]
+    flags[candidates] = 1
+    if len(candidates) == 0:
+        return flags, np.empty((0,2), dtype = np.intp)
+    # find the peak nearest to each monoisotopic mass with a binary search of the sorted mass list
+    order = np.argsort(mass_list, kind = 'stable')
+    sorted_mass = mass_list[order]
+    mono_mass = mass_list[candidates] - c13d2
+    pos = np.searchsorted(sorted_mass, mono_mass)
+    left = np.clip(pos - 1, 0, len(sorted_mass) - 1)
+    right = np.clip(pos, 0, len(sorted_mass) - 1)
+    left_diff = np.abs(sorted_mass[left] - mono_mass)
+    right_diff = np.abs(sorted_mass[right] - mono_mass)
+    mono_pos = order[np.where(right_diff < left_diff, right, left)]
+    mass_diff = np.minimum(left_diff, right_diff)
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        interference = (mass_diff/mass_list[candidates] * 1e6 < tol) & (peak_intensities[mono_pos]/peak_intensities[candidates] < 10)
+    flags[mono_pos[interference]] = 2
+    pairs = np.column_stack((candidates[interference], mono_pos[interference]))
+    return flags, pairs
@@ -1,6 +1,6 @@
 import itertools
 import numpy as np
-import pandas as pd
+from .formula_vocabulary import _encode_samples
 def find_intersections(msTupleDict, exclusive = True):
     """   
 	Docstring for function pykrev.find_intersections
@@ -21,52 +21,25 @@ def find_intersections(msTupleDict, exclusive = True):
 	exclusive: Boolean, True or False, depending on whether you want the intersections to contain only unique values.
     """
     #Setup
-    formula_lists = []
-    group_labels = msTupleDict.keys()
-    for msTuple in msTupleDict.values():
-        formula_lists.append(msTuple.formula)
-    combinations = [seq for i in range(0,len(group_labels)+1) for seq in itertools.combinations(group_labels,i) if len(seq) > 0]
+    group_labels = list(msTupleDict.keys())
+    vocabulary, sample_codes = _encode_samples(msTupleDict) #integer formula codes of each sample in a shared vocabulary
+    presence = np.zeros((len(group_labels), len(vocabulary)), dtype = bool) #presence[i,j] is True if formula j is found in sample i
+    for i, codes in enumerate(sample_codes.values()):
+        presence[i, codes] = True
+    valid = np.array([bool(f) for f in vocabulary], dtype = bool) #empty formula are not counted
+    combinations = [seq for i in range(0,len(group_labels)+1) for seq in itertools.combinations(range(len(group_labels)),i) if len(seq) > 0]
     combinations = sorted(combinations,key = lambda c : len(c),reverse = True) # sort combinations by length
-    if exclusive == True:
-        assigned_formula = set() #create a set that will hold all the formula already assigned to a group
-    amb = pd.DataFrame(data = formula_lists).T
-    amb.columns = group_labels
     intersections = dict() 
     #Main
-    for combo in combinations:         
-            queries = [] 
-            for c in combo:
-                formula = list(filter(None,amb[c])) #Remove None entries introduced by dataframe
-                queries.append(set(formula)) 
-            if len(queries) == 1: #if there is only one query find the unique elements in it 
-                q_set = frozenset(queries[0]) #qset is a frozen set, so it will not be mutated by changes to queries[0]
-                for f_list in formula_lists: #cycle all formula in formula_lists
-                    set_f = frozenset(f_list) #convert f_list to sets, must be frozen so type matches q_set
-                    if set_f == q_set: # ignore the set that corresponds to the query 
-                        pass
-                    else:
-                        queries[0] = queries[0] - set_f #delete any repeated elements in fset
-                            
-                intersections[combo] = queries[0] 
-                
-            elif len(queries) > 1: 
-                if exclusive == True:
-                    q_intersect = intersect(queries)
-                    intersections[combo] = q_intersect - assigned_formula #remove any elements from q_intersect that have already been assigned
-                    assigned_formula.update(q_intersect) #update the assigned_set with q_intersect
-                else:
-                    intersections[combo] = intersect(queries)  
+    for combo in combinations:
+        inside = presence[list(combo)].all(axis = 0) & valid
+        if len(combo) == 1: #if there is only one query find the unique elements in it 
+            query = presence[combo[0]]
+            others = [i for i in range(len(group_labels)) if not np.array_equal(presence[i], query)] # ignore samples with the same formula as the query
+            inside &= ~presence[others].any(axis = 0)
+        elif exclusive == True: #only keep formula found in exactly the samples in combo, i.e. not already assigned to a larger combination
+            outside = [i for i in range(len(group_labels)) if i not in combo]
+            inside &= ~presence[outside].any(axis = 0)
+        intersections[tuple(group_labels[i] for i in combo)] = set(vocabulary.decode(np.flatnonzero(inside)))
     return intersections
     
-def intersect(samples,counter=0):
-    """ This command uses recursion to find the intersections between a variable number of sets given in samples. 
-        Where samples = [set_1,set_2,...,set_n] """
-    if len(samples) == 1: 
-        return samples[0]
-    a = samples[counter]
-    b = samples[counter+1::]
-    if len(b) == 1: #check to see whether the recursion has reached the final element
-        return a & b[0]
-    else:
-        counter += 1 
-        return a & intersect(samples,counter)
\ No newline at end of file
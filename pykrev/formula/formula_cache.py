@@ -0,0 +1,130 @@
+import sys
+import threading
+from collections import OrderedDict
+class _FormulaCache:
+    """ A thread safe least recently used cache of parsed formula count vectors, keyed by (element alphabet, formula string),
+        bounded by the number of bytes of its entries. """
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.enabled = True
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.nbytes = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                value = self._data[key][0]
+            except KeyError:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            previous = self._data.pop(key, None)
+            if previous is not None:
+                self.nbytes -= previous[1]
+            nbytes = _entry_bytes(key, value)
+            self._data[key] = (value, nbytes)
+            self.nbytes += nbytes
+            self._evict()
+
+    def _evict(self):
+        while self.nbytes > self.max_bytes:
+            _, (_, nbytes) = self._data.popitem(last = False)
+            self.nbytes -= nbytes
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.nbytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+def _entry_bytes(key, value):
+    """ The bytes held by a cache entry: the formula string, the count tuple and the key tuple (the element alphabet is shared by all entries). """
+    return sys.getsizeof(key) + sys.getsizeof(key[1]) + sys.getsizeof(value)
+
+_formula_cache = _FormulaCache(max_bytes = 2**25)
+
+def formula_cache_info():
+    """
+    Docstring for function pykrev.formula_cache_info
+    ==========
+    Reports the state of the process wide formula parse cache used by pykrev.element_matrix (and therefore by all formula functions).
+
+    Use
+    ----------
+    formula_cache_info()
+
+    Returns a dictionary containing the number of cache 'hits', 'misses' and 'evictions', the current number of cached formula ('size'),
+    the bytes held by the cached formula ('bytes'), the maximum number of bytes ('max_bytes') and whether the cache is 'enabled'.
+    """
+    with _formula_cache._lock:
+        return {'hits': _formula_cache.hits,
+                'misses': _formula_cache.misses,
+                'evictions': _formula_cache.evictions,
+                'size': len(_formula_cache._data),
+                'bytes': _formula_cache.nbytes,
+                'max_bytes': _formula_cache.max_bytes,
+                'enabled': _formula_cache.enabled}
+
+def clear_formula_cache():
+    """
+    Docstring for function pykrev.clear_formula_cache
+    ==========
+    Removes all formula from the process wide formula parse cache and resets the hit, miss and eviction statistics.
+
+    Use
+    ----------
+    clear_formula_cache()
+
+    Returns None.
+    """
+    _formula_cache.clear()
+
+def configure_formula_cache(max_bytes = None, enabled = None):
+    """
+    Docstring for function pykrev.configure_formula_cache
+    ==========
+    Sets the memory bound of the process wide formula parse cache or switches it on and off.
+
+    Use
+    ----------
+    configure_formula_cache(max_bytes = 2**20)
+
+    Returns None.
+
+    Parameters
+    ----------
+    max_bytes: int, the maximum number of bytes held by the cached formula. When the cache is full the least recently used formula are evicted.
+        Each cached formula holds its formula string and a tuple of atom counts (roughly 220 bytes with the default element alphabet). If None the bound is unchanged.
+
+    enabled: bool, switch the cache on (True) or off (False). Switching the cache off also clears it. If None the state is unchanged.
+
+    Info
+    ----------
+    The cache is keyed by the formula string and the element alphabet, so the same formula parsed with different alphabets is cached separately.
+    The bytes of each cached formula are measured with sys.getsizeof of its key, formula string and count tuple; the small integers of the counts are shared by Python and not counted.
+    The default bound is 32 MB (around 150000 formula).
+    """
+    #Tests
+    assert max_bytes is None or (type(max_bytes) == int and max_bytes >= 0), 'max_bytes must be a positive integer'
+    assert enabled is None or type(enabled) == bool, 'enabled must be a boolean'
+    #Main
+    if max_bytes is not None:
+        with _formula_cache._lock:
+            _formula_cache.max_bytes = max_bytes
+            _formula_cache._evict()
+    if enabled is not None:
+        _formula_cache.enabled = enabled
+        if enabled == False:
+            _formula_cache.clear()
@@ -0,0 +1,212 @@
+from collections.abc import Sequence
+import numpy as np
+import pandas as pd
+from .element_matrix import element_matrix, ELEMENTS
+from .descriptors import descriptors
+class FormulaVocabulary:
+    """
+    Docstring for class pykrev.FormulaVocabulary
+    ==========
+    A string table of unique molecular formula. Each formula is stored once and identified by an integer code,
+    so that formula lists can be held and compared as int32 code arrays.
+
+    Use
+    ----------
+    FormulaVocabulary(Y)
+
+    Returns a FormulaVocabulary containing the unique formula in Y, coded in order of first occurrence.
+
+    Parameters
+    ----------
+    Y: A list of molecular formula strings (optional)
+
+    Methods
+    ----------
+    FormulaVocabulary.encode(Y, add = True): returns an int32 numpy.ndarray of the codes of the formula in Y.
+        If add is True formula not in the vocabulary are added to it, otherwise they are coded as -1.
+
+    FormulaVocabulary.decode(codes): returns a list of the formula strings for an array of codes
+
+    FormulaVocabulary.code(formula): returns the code of a single formula, or -1 if it is not in the vocabulary
+
+    FormulaVocabulary.element_matrix(elements): returns the element count matrix of every formula in the vocabulary (see pykrev.element_matrix)
+
+    FormulaVocabulary.descriptors(names): returns the descriptor table of every formula in the vocabulary (see pykrev.descriptors)
+
+    Info
+    ----------
+    Codes are never reassigned, so code arrays stay valid as the vocabulary grows.
+    Element count matrices and descriptor tables are cached and extended with only the new formula when the vocabulary grows.
+    Decoded formula are the strings stored in the vocabulary, so decoding shares one string object per formula.
+    """
+    def __init__(self, formula = []):
+        self.formula = []
+        self.codes = dict()
+        self._matrices = dict()
+        self._tables = dict()
+        self.encode(formula)
+
+    def __repr__(self) -> str:
+        return f'FormulaVocabulary({len(self.formula)} formula)'
+
+    def __len__(self):
+        return len(self.formula)
+
+    def __contains__(self, formula):
+        return formula in self.codes
+
+    def __iter__(self):
+        return iter(self.formula)
+
+    def __getitem__(self, code):
+        return self.formula[code]
+
+    def __getstate__(self):
+        # cached matrices and tables are rebuilt on demand
+        return {'formula': self.formula}
+
+    def __setstate__(self, state):
+        self.__init__(state['formula'])
+
+    def code(self, formula):
+        return self.codes.get(formula, -1)
+
+    def encode(self, formula_list, add = True):
+        codes = self.codes
+        get = codes.get
+        vocabulary = self.formula
+        coded = []
+        for formula in formula_list:
+            code = get(formula)
+            if code is None:
+                if add:
+                    code = codes[formula] = len(vocabulary)
+                    vocabulary.append(formula)
+                else:
+                    code = -1
+            coded.append(code)
+        return np.array(coded, dtype = np.int32)
+
+    def decode(self, codes):
+        vocabulary = self.formula
+        return [vocabulary[code] for code in np.asarray(codes).tolist()]
+
+    def element_matrix(self, elements = ELEMENTS):
+        key = tuple(elements)
+        cached = self._matrices.get(key)
+        if cached is None or len(cached[0]) < len(self.formula):
+            start = 0 if cached is None else len(cached[0])
+            countMatrix, elementIndex = element_matrix(self.formula[start:], elements = list(elements))
+            if cached is not None:
+                countMatrix = np.concatenate([cached[0], countMatrix])
+            countMatrix.flags.writeable = False
+            cached = self._matrices[key] = (countMatrix, elementIndex)
+        return cached
+
+    def descriptors(self, names = ['rAI','AImod','DBE','NOSC','HC','OC','mass']):
+        return self._descriptor_table(names).copy()
+
+    def _descriptor_table(self, names):
+        key = tuple(names)
+        table = self._tables.get(key)
+        if table is None or len(table) < len(self.formula):
+            start = 0 if table is None else len(table)
+            newTable = descriptors(self.formula[start:], names = list(names))
+            table = newTable if table is None else pd.concat([table, newTable], ignore_index = True)
+            self._tables[key] = table
+        return table
+
+class CodedFormula(Sequence):
+    """
+    Docstring for class pykrev.CodedFormula
+    ==========
+    A read only formula list held as an int32 code array into a FormulaVocabulary. Formula strings are looked up in the vocabulary as they are accessed.
+
+    Use
+    ----------
+    CodedFormula(V, codes)
+
+    Returns a CodedFormula of the formula of codes in V.
+
+    Parameters
+    ----------
+    V: A FormulaVocabulary
+    codes: An int32 numpy.ndarray of codes in V
+
+    Info
+    ----------
+    A CodedFormula holds 4 bytes per formula instead of the 8 byte reference (and the string) of each formula in a list.
+    It supports len, indexing, iteration, in, index and count like a list and compares equal to a list of the same formula.
+    Indexing with a slice, a boolean array or an index array returns a CodedFormula of the selected codes. Use list(Y) to decode it to a list.
+    msTuples hold their formula as a CodedFormula when compacted (see msTuple.compact, msTupleDict.compact and msTupleStore).
+    """
+    def __init__(self, vocabulary, codes):
+        self.vocabulary = vocabulary
+        self.codes = codes
+
+    def __repr__(self) -> str:
+        return f'CodedFormula({list(self)})'
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            return self.vocabulary.formula[self.codes[index]]
+        return CodedFormula(self.vocabulary, self.codes[index])
+
+    def __iter__(self):
+        return iter(self.vocabulary.decode(self.codes))
+
+    def __contains__(self, formula):
+        code = self.vocabulary.code(formula)
+        return code != -1 and bool((self.codes == code).any())
+
+    def index(self, formula, start = 0, stop = None):
+        code = self.vocabulary.code(formula)
+        rows = np.arange(len(self.codes))[start:stop]
+        rows = rows[self.codes[rows] == code] if code != -1 else rows[:0]
+        if len(rows) == 0:
+            raise ValueError(f'{formula!r} is not in list')
+        return int(rows[0])
+
+    def count(self, formula):
+        code = self.vocabulary.code(formula)
+        return 0 if code == -1 else int((self.codes == code).sum())
+
+    def __eq__(self, other):
+        if isinstance(other, CodedFormula):
+            if other.vocabulary is self.vocabulary:
+                return np.array_equal(self.codes, other.codes)
+            return list(self) == list(other)
+        if isinstance(other, list):
+            return list(self) == other
+        return NotImplemented
+
+    __hash__ = None
+
+def _encode_samples(samples):
+    """ Return the vocabulary and a dictionary of per sample formula code arrays for a dictionary of msTuples.
+        msTupleDicts return their shared vocabulary, other dictionaries are encoded into a new vocabulary. """
+    if hasattr(samples, 'formula_codes'):
+        return samples.vocabulary(), samples.formula_codes()
+    vocabulary = FormulaVocabulary()
+    return vocabulary, {name: vocabulary.encode(msTupleObj[0]) for name, msTupleObj in samples.items()}
+
+def _scatter_samples(sampleCodes, sampleValues, size, fill = np.nan, dtype = float, key = None):
+    """ Scatter per sample values into a (samples x formula) matrix whose columns are the vocabulary codes found in any sample, in code order,
+        or sorted by key (an array of one value per vocabulary code) if given.
+        If a formula occurs more than once in a sample its first occurrence is used. Returns the matrix and the codes of its columns. """
+    present = np.zeros(size, dtype = bool)
+    for codes in sampleCodes:
+        present[codes] = True
+    columnCodes = np.flatnonzero(present)
+    if key is not None:
+        columnCodes = columnCodes[np.argsort(np.asarray(key)[columnCodes], kind = 'stable')]
+    columnOf = np.full(size, -1, dtype = np.intp)
+    columnOf[columnCodes] = np.arange(len(columnCodes))
+    matrix = np.full((len(sampleCodes), len(columnCodes)), fill, dtype = dtype)
+    for row, (codes, values) in enumerate(zip(sampleCodes, sampleValues)):
+        unique, first = np.unique(codes, return_index = True)
+        matrix[row, columnOf[unique]] = np.asarray(values)[first]
+    return matrix, columnCodes
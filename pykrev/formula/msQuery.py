@@ -0,0 +1,65 @@
+import numpy as np
+class msQuery:
+    """
+    Docstring for class pykrev.msQuery
+    ==========
+    A lazy filter chain on an msTuple. Filters are recorded and only applied when collect() is called,
+    at which point they are combined into a single boolean mask and the msTuple is validated and gathered once.
+
+    Use
+    ----------
+    Y.query().mz(200,800).intensity(1e6,None).where(boolArray).collect()
+
+    Returns an msQuery. Each filter method returns a new msQuery, so a chain can be branched and reused.
+
+    Parameters
+    ----------
+    Y: An msTuple
+
+    Methods
+    ----------
+    msQuery.mz(low,high): keep peaks with low < mz < high. Either bound can be None.
+
+    msQuery.intensity(low,high): keep peaks with low < intensity < high. Either bound can be None.
+
+    msQuery.where(boolArray): keep peaks where boolArray is True.
+
+    msQuery.mask(): returns the combined boolean mask of all filters in the chain.
+
+    msQuery.collect(): returns a new msTuple containing the peaks that pass all filters in the chain.
+    """
+    def __init__(self, msTupleObj, predicates = ()):
+        self.msTuple = msTupleObj
+        self.predicates = tuple(predicates)
+
+    def __repr__(self) -> str:
+        return f'msQuery({len(self.predicates)} filters on an msTuple of {len(self.msTuple.formula)} formula)'
+
+    def mz(self, low = None, high = None):
+        return msQuery(self.msTuple, self.predicates + (('mz', low, high),))
+
+    def intensity(self, low = None, high = None):
+        return msQuery(self.msTuple, self.predicates + (('intensity', low, high),))
+
+    def where(self, boolArray):
+        boolArray = np.asarray(boolArray)
+        assert boolArray.dtype == bool, 'msQuery.where requires a boolean array, use msTuple.filter_bool for index arrays'
+        return msQuery(self.msTuple, self.predicates + (('where', boolArray, None),))
+
+    def mask(self):
+        self.msTuple.validate()
+        mask = np.ones(len(self.msTuple.formula), dtype = bool)
+        for column, low, high in self.predicates:
+            if column == 'where':
+                assert len(low) == len(mask), 'boolean array must be the same length as the msTuple'
+                mask &= low
+                continue
+            values = getattr(self.msTuple, column)
+            if low is not None:
+                mask &= values > low
+            if high is not None:
+                mask &= values < high
+        return mask
+
+    def collect(self):
+        return self.msTuple.take(self.mask())
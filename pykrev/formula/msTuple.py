@@ -1,7 +1,15 @@
 from typing import NamedTuple
 import numpy as np
 import pandas as pd
-class msTuple(NamedTuple):
+from .msQuery import msQuery
+from .formula_vocabulary import FormulaVocabulary, CodedFormula
+from .element_matrix import ELEMENTS
+class _msTupleFields(NamedTuple):
+    formula: list
+    intensity: np.ndarray
+    mz: np.ndarray
+
+class msTuple(_msTupleFields):
     """ 
     Docstring for class pykrev.msTuple
     ==========
@@ -32,24 +40,54 @@ class msTuple(NamedTuple):
 
     msTuple.filter_intensity(low,high): returns a new msTuple filtered between low and high intensity
 
-    msTuple.filter_spectral_interference(): returns a new msTuple which has been filtered of spectral interference by doubley charged molecular ions (see pykrev.filter_spectral_interference)
+    msTuple.filter_spectral_interference(tol, verbose, return_pairs): returns a new msTuple which has been filtered of spectral interference by doubley charged molecular ions (see pykrev.filter_spectral_interference)
 
     msTuple.filter_bool(boolArray): returns a new msTuple which is filtered by a boolean array
 
+    msTuple.take(index): returns a new msTuple of the rows selected by a boolean array, an index array or a slice. Slices give views of the intensity and mz arrays.
+
+    msTuple.query(): returns a lazy filter chain (see pykrev.msQuery) e.g. Y.query().mz(200,800).intensity(1e6,None).where(boolArray).collect()
+
+    msTuple.mz_order(): returns the permutation that sorts msTuple.mz in ascending order
+
+    msTuple.mz_window(low,high): returns a new msTuple of the peaks between low and high mz, in ascending mz order
+
+    msTuple.nearest_mz(mz,ppm): returns the index of the nearest peak to each mz value within a ppm tolerance, or -1 if there is none
+
+    msTuple.iter_sorted(): iterates over (formula, intensity, mz) in ascending mz order
+
+    msTuple.formula_index(): returns a dictionary mapping each formula to the row of its first occurrence in msTuple.formula
+
+    msTuple.formula_codes(): returns an int32 numpy.ndarray of the codes of msTuple.formula in msTuple.vocabulary()
+
+    msTuple.vocabulary(): returns the FormulaVocabulary (see pykrev.FormulaVocabulary) that msTuple.formula_codes() refer to
+
+    msTuple.compact(): returns a new msTuple whose formula is held as its formula codes (see pykrev.CodedFormula) and decoded on access
+
+    msTuple.element_matrix(elements): returns the element count matrix of msTuple.formula (see pykrev.element_matrix), computed once per unique formula and cached
+
+    msTuple.descriptors(names): returns the descriptor table of msTuple.formula (see pykrev.descriptors), computed once per unique formula and cached
+
     msTuple.to_csv(): writes the msTuple to a .csv file
+
+    msTuple.to_npz(path, descriptors = []): writes the msTuple to a binary .npz file, optionally with the descriptors named in descriptors (see pykrev.read_npz)
+
+    Info
+    ----------
+    The mz sort permutation, the formula index and the formula codes are computed once and cached on the msTuple. msTuples are immutable, so the cache is never stale unless
+    the arrays are modified in place. New msTuples (e.g. from _replace) start with an empty cache, except that msTuples returned by
+    take and the filter methods share the vocabulary (and its cached element count matrices and descriptor tables) and gather the formula codes of their parent, once these have been computed.
+    msTuple.formula is a list of strings, and the formula codes are a cache held in addition to it: computing them adds 4 bytes per peak and a vocabulary of its unique formula.
+    A compacted msTuple holds its formula as a CodedFormula instead of a list, which is read only and decodes each formula as it is accessed. Its formula codes are the codes of the CodedFormula.
     """
     
-    formula: list
-    intensity: np.ndarray
-    mz: np.ndarray
-    
     def __repr__(self) -> str:
         return f'msTuple(formula={np.array(self.formula)}), intensity={self.intensity}, mz={self.mz}'
     
     def validate(self):
-        assert type(self.formula) == list, "msTuple.formula must be provided as a list"
-        assert type(self.intensity) == np.ndarray, "msTuple.intensity must be provided as an ndarray"
-        assert type(self.mz) == np.ndarray, "msTuple.mz must be provided as an ndarray"
+        assert isinstance(self.formula, (list, CodedFormula)), "msTuple.formula must be provided as a list"
+        assert isinstance(self.intensity, np.ndarray), "msTuple.intensity must be provided as an ndarray"
+        assert isinstance(self.mz, np.ndarray), "msTuple.mz must be provided as an ndarray"
         assert len(self.formula) > 1, "msTuple.formula must not be empty"
         assert len(self.formula) == len(self.intensity) == len(self.mz), "msTuple.formula, msTuple.intensity and msTuple.mz must be of equal length"
     
@@ -61,63 +99,130 @@ class msTuple(NamedTuple):
         print(f'mean mz = {np.mean(self.mz)} ')
         print(f'std mz = {np.std(self.mz):.1E}')
     
-    def filter_spectral_interference(self, tol = 2, verbose = True):
-        #Setup
+    def filter_spectral_interference(self, tol = 2, verbose = True, return_pairs = False):
+        from .filter_spectral_interference import filter_spectral_interference
         self.validate()
-        mass_list = self.mz
-        formula_list = np.array(self.formula)
-        peak_intensities = self.intensity
-        mass_defect = mass_list - np.floor(mass_list)
-        c13d2 = (13.00335-12)/2
-        flags = np.zeros(len(mass_list))
-        #Main
-        for i in range(0,len(mass_list)):
-            if mass_defect[i] > 0.4 and mass_defect[i] < 0.8:
-                flags[i] = 1
-                mono_mass = mass_list[i] - c13d2
-                mass_diff = abs(mass_list - mono_mass)
-                mono_pos = mass_diff == min(mass_diff)
-                if min(mass_diff)/mass_list[i] * 1e6 < tol:
-                    if peak_intensities[mono_pos]/peak_intensities[i] < 10:
-                        flags[mono_pos] = 2
-        spectralFilter = flags == 0 
-        filtermz = mass_list[spectralFilter]
-        filterformula = formula_list[spectralFilter]
-        filterintensity = peak_intensities[spectralFilter]
-        if verbose == True:
-            print(f"{len(mass_list)-len(filtermz)} interferences removed.")
-        filterformula = list(filterformula) #reconvert filter_formula to list to sort out data type issue
-        return self._replace(formula = filterformula, intensity = filterintensity, mz = filtermz)
+        return filter_spectral_interference(self, tol = tol, verbose = verbose, return_pairs = return_pairs)
     
     def filter_mz(self,low,high):
-        self.validate()
-        highpassBool = self.mz > low
-        lowpassBool = self.mz < high
-        bandpassBool = highpassBool & lowpassBool
-        fArray = np.array(self.formula)
-        filtermz = self.mz[bandpassBool]
-        filterintensity = self.intensity[bandpassBool]
-        filterformula = list(fArray[bandpassBool])
-        return self._replace(formula = filterformula, intensity = filterintensity, mz = filtermz)
+        return self.query().mz(low,high).collect()
     
     def filter_intensity(self,low,high):
-        self.validate()
-        highpassBool = self.intensity > low
-        lowpassBool = self.intensity < high
-        bandpassBool = highpassBool & lowpassBool
-        fArray = np.array(self.formula)
-        filtermz = self.mz[bandpassBool]
-        filterintensity = self.intensity[bandpassBool]
-        filterformula = list(fArray[bandpassBool])
-        return self._replace(formula = filterformula, intensity = filterintensity, mz = filtermz)
+        return self.query().intensity(low,high).collect()
 
     def filter_bool(self,boolArray):
         self.validate()
-        filtermz = self.mz[boolArray]
-        filterintensity = self.intensity[boolArray]
-        fArray = np.array(self.formula)
-        filterformula = list(fArray[boolArray])
-        return self._replace(formula = filterformula, intensity = filterintensity, mz = filtermz)
+        return self.take(boolArray)
+
+    def query(self):
+        return msQuery(self)
+
+    def take(self, index):
+        if isinstance(index, slice):
+            # slices are views of the intensity and mz arrays
+            positions = index
+            filterformula = self.formula[index]
+        else:
+            positions = np.arange(len(self.formula))[index]
+            formula = self.formula
+            if isinstance(formula, CodedFormula):
+                filterformula = formula[positions]
+            else:
+                filterformula = [formula[i] for i in positions.tolist()]
+        filtered = self._replace(formula = filterformula, intensity = self.intensity[positions], mz = self.mz[positions])
+        codes = self.__dict__.get('_formula_codes_cache')
+        if codes is not None:
+            filtered._set_codes(self.__dict__['_vocabulary_cache'], codes[positions])
+        return filtered
+
+    def __getstate__(self):
+        # cached indices are not pickled, they are rebuilt on demand
+        return None
+
+    def mz_order(self):
+        order = self.__dict__.get('_mz_order_cache')
+        if order is None:
+            mz = np.asarray(self.mz, dtype = float)
+            if np.all(mz[1:] >= mz[:-1]):
+                order = np.arange(len(mz))
+                sortedMz = mz.view()
+            else:
+                order = np.argsort(mz, kind = 'stable')
+                sortedMz = mz[order]
+            order.flags.writeable = False
+            sortedMz.flags.writeable = False
+            self.__dict__['_sorted_mz_cache'] = sortedMz
+            self.__dict__['_mz_order_cache'] = order
+        return order
+
+    def _sorted_mz(self):
+        self.mz_order()
+        return self.__dict__['_sorted_mz_cache']
+
+    def mz_window(self, low, high):
+        order = self.mz_order()
+        sortedMz = self._sorted_mz()
+        start = np.searchsorted(sortedMz, low, side = 'right')
+        stop = np.searchsorted(sortedMz, high, side = 'left')
+        return self.take(order[start:max(start,stop)])
+
+    def nearest_mz(self, mz, ppm = 1):
+        order = self.mz_order()
+        sortedMz = self._sorted_mz()
+        query = np.asarray(mz, dtype = float)
+        if len(sortedMz) == 0:
+            return np.full(query.shape, -1) if query.ndim else -1
+        right = np.clip(np.searchsorted(sortedMz, query), 0, len(sortedMz) - 1)
+        left = np.clip(right - 1, 0, len(sortedMz) - 1)
+        nearest = np.where(np.abs(sortedMz[right] - query) < np.abs(sortedMz[left] - query), right, left)
+        error = np.abs(sortedMz[nearest] - query) / query * 1e6
+        index = np.where(error <= ppm, order[nearest], -1)
+        return index if query.ndim else int(index)
+
+    def iter_sorted(self):
+        formula = self.formula
+        for i in self.mz_order().tolist():
+            yield formula[i], self.intensity[i], self.mz[i]
+
+    def formula_index(self):
+        index = self.__dict__.get('_formula_index_cache')
+        if index is None:
+            index = self.__dict__['_formula_index_cache'] = _formula_index(self.formula)
+        return index
+
+    def formula_codes(self):
+        codes = self.__dict__.get('_formula_codes_cache')
+        if codes is None and isinstance(self.formula, CodedFormula):
+            codes = self.formula.codes
+            self._set_codes(self.formula.vocabulary, codes)
+        elif codes is None:
+            vocabulary = FormulaVocabulary()
+            codes = vocabulary.encode(self.formula)
+            codes.flags.writeable = False
+            self._set_codes(vocabulary, codes)
+        return codes
+
+    def _set_codes(self, vocabulary, codes):
+        """ Attach the codes of msTuple.formula in vocabulary to a newly created msTuple and return it. """
+        self.__dict__['_vocabulary_cache'] = vocabulary
+        self.__dict__['_formula_codes_cache'] = codes
+        return self
+
+    def vocabulary(self):
+        self.formula_codes()
+        return self.__dict__['_vocabulary_cache']
+
+    def compact(self):
+        codes = self.formula_codes()
+        return self._replace(formula = CodedFormula(self.vocabulary(), codes))._set_codes(self.vocabulary(), codes)
+
+    def element_matrix(self, elements = ELEMENTS):
+        countMatrix, elementIndex = self.vocabulary().element_matrix(elements)
+        return countMatrix[self.formula_codes()], elementIndex
+
+    def descriptors(self, names = ['rAI','AImod','DBE','NOSC','HC','OC','mass']):
+        table = self.vocabulary()._descriptor_table(names)
+        return table.iloc[self.formula_codes()].reset_index(drop = True)
 
     def to_csv(self, path):
         self.validate()
@@ -126,4 +231,37 @@ class msTuple(NamedTuple):
         csv['intensity'] = self.intensity
         csv['m/z'] = self.mz
         csv.to_csv(path, index= False)
-        print(f'msTuple written to {path}')
\ No newline at end of file
+        print(f'msTuple written to {path}')
+
+    def to_npz(self, path, descriptors = []):
+        from .read_npz import _write_npz
+        self.validate()
+        _write_npz(path, 'msTuple', [''], [(self.formula_codes(), self.intensity, self.mz)], self.vocabulary(), descriptors)
+
+def _formula_index(formula_list):
+    """ Map each formula to the row of its first occurrence in formula_list (the same row as formula_list.index(formula)). """
+    return dict(zip(reversed(formula_list), range(len(formula_list) - 1, -1, -1)))
+
+def _row_index(msTupleObj):
+    """ The formula index of an msTuple, or of the formula list of a plain tuple. """
+    if isinstance(msTupleObj, msTuple):
+        return msTupleObj.formula_index()
+    return _formula_index(msTupleObj[0])
+
+def _mz_order(msTupleObj):
+    """ The mz sort permutation of an msTuple (cached), or of the mz values of a plain tuple. """
+    if isinstance(msTupleObj, msTuple):
+        return msTupleObj.mz_order()
+    return np.argsort(np.asarray(msTupleObj[2], dtype = float), kind = 'stable')
+
+def _inverted_formula_index(samples):
+    """ Map each formula found in a dictionary of msTuples to a list of (sample name, row) pairs, in sample order. """
+    index = dict()
+    for name, msTupleObj in samples.items():
+        for formula, row in _row_index(msTupleObj).items():
+            rows = index.get(formula)
+            if rows is None:
+                index[formula] = [(name, row)]
+            else:
+                rows.append((name, row))
+    return index
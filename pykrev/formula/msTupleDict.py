@@ -1,10 +1,88 @@
+import contextlib
 import pandas as pd
 import numpy as np
-from ..diversity.ordination_matrix import ordination_matrix
+from ..diversity import ordination_matrix
 from .find_intersections import find_intersections
 from .average_mstuple import average_mstuple
+from .msTuple import msTuple, _inverted_formula_index
+from .formula_vocabulary import FormulaVocabulary, CodedFormula
 
-class msTupleDict(dict):
+class _msTupleCohort:
+    """ Methods shared by mappings of sample names to msTuples (msTupleDict and msTupleStore), which provide __getitem__, keys, items and values,
+        and _sample_codes, a dictionary of the formula codes of each sample. """
+    def _invalidate(self):
+        self.__dict__.pop('_formula_index_cache', None)
+
+    def vocabulary(self):
+        vocabulary = self.__dict__.get('_vocabulary_cache')
+        if vocabulary is None:
+            vocabulary = self.__dict__['_vocabulary_cache'] = FormulaVocabulary()
+        return vocabulary
+
+    def formula_codes(self):
+        return dict(self._sample_codes())
+
+    def formula_index(self):
+        index = self.__dict__.get('_formula_index_cache')
+        if index is None:
+            index = self.__dict__['_formula_index_cache'] = _inverted_formula_index(self)
+        return index
+
+    def validate(self):
+        for v in self.values():
+            v.validate()
+
+    def _validated(self):
+        """ Validate the samples before a cohort operation, returns a context manager to run the operation in. """
+        self.validate()
+        return contextlib.nullcontext()
+
+    def summary(self):
+        print(f'msTupleDict containing {len(self)} samples.')
+        print()
+        for k,v in zip(self.keys(),self.values()):
+            print(f'{k} summary')
+            print(f'{"*"*20}')
+            v.summary()
+            print()
+
+    def subset(self, subsetList = []):
+        with self._validated():
+            subset = msTupleDict()
+            subset.__dict__['_vocabulary_cache'] = self.vocabulary()
+            if self.__dict__.get('_compact', False):
+                subset.compact()
+            subset.update({key: value for key, value in self.items() if key in subsetList})
+            return subset
+
+    def average(self, intensityMethod = 'mean', mzMethod = 'mean', minOccurrence = 1, zeroValues = True, stdDev = False):
+        with self._validated():
+            return average_mstuple(self, intensityMethod = intensityMethod, mzMethod = mzMethod, minOccurrence = minOccurrence, zeroValues = zeroValues, stdDev = stdDev)
+
+    def intersections(self, exclusive = True):
+        with self._validated():
+            return find_intersections(self,exclusive = exclusive)
+    
+    def to_DataFrame(self):
+        with self._validated():
+            df = pd.DataFrame(index=self.keys())
+            for k,v in zip(self.keys(),self.values()):
+                df.loc[k,'assigned formula'] = len(v.formula)
+                df.loc[k,'mean mz'] = np.mean(v.mz)
+                df.loc[k,'std mz'] = np.std(v.mz)
+            return df
+    
+    def to_npz(self, path, descriptors = []):
+        from .read_npz import _write_npz
+        with self._validated():
+            codes = self._sample_codes()
+            _write_npz(path, 'msTupleDict', list(self.keys()), [(codes[k], v.intensity, v.mz) for k, v in self.items()], self.vocabulary(), descriptors)
+
+    def to_OrdinationMatrix(self, impute_value = 'nan', sort_columns = 'occurrence', dtype = np.float64):
+        with self._validated():
+            return ordination_matrix(self, impute_value = impute_value, sort_columns = sort_columns, dtype = dtype)
+
+class msTupleDict(_msTupleCohort, dict):
     """ 
     Docstring for class pykrev.msTupleDict
     ==========
@@ -29,46 +107,101 @@ class msTupleDict(dict):
 
     msTupleDict.intersections(exclusive = True): return a dictionary contanining all intersections between the formula in msTupleDict. See pk.find_intersections.
 
-    msTupleDict.to_OrdinationMatrix(impute_value = 'nan'): write the contents of the msTupleDict to an ordination matrix. See pk.ordination_matrix. 
+    msTupleDict.to_OrdinationMatrix(impute_value = 'nan', sort_columns = 'occurrence', dtype = np.float64): write the contents of the msTupleDict to an ordination matrix. See pk.ordination_matrix. 
 
     msTupleDict.to_DataFrame(): write the contents of the msTupleDict to a pandas dataframe. Columns are 'assigned formula', 'mean mz' and 'std mz'
 
+    msTupleDict.to_npz(path, descriptors = []): write all samples to a single binary .npz file, optionally with the descriptors named in descriptors (see pykrev.read_npz)
+
+    msTupleDict.formula_index(): return a dictionary mapping each formula to a list of (sample name, row) pairs for the samples it is found in.
+
+    msTupleDict.vocabulary(): return the FormulaVocabulary shared by all samples (see pykrev.FormulaVocabulary)
+
+    msTupleDict.formula_codes(): return a dictionary with sample names as keys and int32 arrays of formula codes into msTupleDict.vocabulary() as values
+
+    msTupleDict.compact(): hold the formula of all samples, and of samples added later, as their formula codes (see pykrev.CodedFormula). Returns the msTupleDict.
+
+    Info
+    ----------
+    Each msTuple added to the dictionary is encoded into one shared formula vocabulary and stored with the vocabulary strings as its formula list,
+    so each formula string is held once across all samples. A compacted msTupleDict stores each msTuple with a CodedFormula instead,
+    which holds 4 bytes per peak in place of the 8 byte reference of a list, and decodes formula strings as they are accessed. Cross sample operations (e.g. ordination_matrix, find_intersections, average_mstuple) run on the integer codes.
+    Subsets share the vocabulary of their parent. Formula of deleted samples remain in the vocabulary.
+    The formula index is built once and cached. It is rebuilt after the dictionary is modified (e.g. a sample is added, replaced or deleted).
     """
-    def validate(self):
-        for v in self.values():
-            v.validate()
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self.update(*args, **kwargs)
 
-    def summary(self):
-        print(f'msTupleDict containing {len(self)} samples.')
-        print()
-        for k,v in zip(self.keys(),self.values()):
-            print(f'{k} summary')
-            print(f'{"*"*20}')
-            v.summary()
-            print()
+    def __getstate__(self):
+        # the vocabulary and formula codes are rebuilt as the samples are unpickled
+        return {'compact': True} if self.__dict__.get('_compact', False) else None
 
-    def subset(self, subsetList = []):
-        self.validate()
-        return msTupleDict({key: value for key, value in self.items() if key in subsetList})
+    def __setstate__(self, state):
+        if state['compact']:
+            self.compact()
 
-    def average(self, intensityMethod = 'mean', mzMethod = 'mean', minOccurrence = 1, zeroValues = True, stdDev = False):
-        self.validate()
-        return average_mstuple(self, intensityMethod = intensityMethod, mzMethod = mzMethod, minOccurrence = minOccurrence, zeroValues = zeroValues, stdDev = stdDev)
+    def __setitem__(self, key, value):
+        self._invalidate()
+        vocabulary = self.vocabulary()
+        compact = self.__dict__.get('_compact', False)
+        shared = isinstance(value, msTuple) and value.__dict__.get('_vocabulary_cache') is vocabulary
+        if shared:
+            codes = value.formula_codes()
+        else:
+            codes = vocabulary.encode(value[0])
+            codes.flags.writeable = False
+        if isinstance(value, msTuple) and (not shared or (compact and not isinstance(value.formula, CodedFormula))):
+            # store the vocabulary strings (or codes) so that each formula string is held once across samples
+            formula = CodedFormula(vocabulary, codes) if compact else vocabulary.decode(codes)
+            value = value._replace(formula = formula)._set_codes(vocabulary, codes)
+        self._sample_codes()[key] = codes
+        super().__setitem__(key, value)
 
-    def intersections(self, exclusive = True):
-        self.validate()
-        return find_intersections(self,exclusive = exclusive)
-    
-    def to_DataFrame(self):
-        self.validate()
-        df = pd.DataFrame(index=self.keys())
-        for k,v in zip(self.keys(),self.values()):
-            df.loc[k,'assigned formula'] = len(v.formula)
-            df.loc[k,'mean mz'] = np.mean(v.mz)
-            df.loc[k,'std mz'] = np.std(v.mz)
-        return df
-    
-    def to_OrdinationMatrix(self, impute_value = 'nan'):
-        self.validate()
-        return ordination_matrix(self, impute_value = impute_value)
+    def __delitem__(self, key):
+        self._invalidate()
+        super().__delitem__(key)
+        del self._sample_codes()[key]
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def setdefault(self, key, default = None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def pop(self, key, *args):
+        if key not in self:
+            return super().pop(key, *args)
+        value = self[key]
+        del self[key]
+        return value
+
+    def popitem(self):
+        if not self:
+            raise KeyError('popitem(): dictionary is empty')
+        key = next(reversed(self.keys()))
+        return key, self.pop(key)
+
+    def clear(self):
+        self._invalidate()
+        super().clear()
+        self._sample_codes().clear()
+
+    def compact(self):
+        self.__dict__['_compact'] = True
+        for key, value in list(self.items()):
+            self[key] = value
+        return self
 
+    def _sample_codes(self):
+        codes = self.__dict__.get('_sample_codes_cache')
+        if codes is None:
+            codes = self.__dict__['_sample_codes_cache'] = dict()
+        return codes
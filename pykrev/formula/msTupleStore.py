@@ -0,0 +1,240 @@
+import os
+import json
+import contextlib
+from collections import OrderedDict
+from collections.abc import MutableMapping
+import numpy as np
+from .msTuple import msTuple
+from .msTupleDict import msTupleDict, _msTupleCohort
+from .formula_vocabulary import FormulaVocabulary, CodedFormula
+_FORMAT = 'pykrev-store-1'
+class msTupleStore(_msTupleCohort, MutableMapping):
+    """
+    Docstring for class pykrev.msTupleStore
+    ==========
+    A mapping of sample names to msTuples, like an msTupleDict, kept in a directory on disk, for cohorts that do not fit in memory.
+    Samples are written to disk when they are added and read back when they are accessed. Recently accessed samples are kept in memory
+    up to a memory budget, beyond which the least recently used samples are evicted.
+
+    Use
+    ----------
+    msTupleStore(Y)
+
+    Returns an msTupleStore. If the directory Y holds a store it is opened, otherwise a new empty store is created in it.
+
+    Parameters
+    ----------
+    Y: String, path to the store directory.
+
+    memory_budget: int, the maximum number of bytes of samples to keep in memory (default 1 GB).
+
+    compact: boolean, read samples with their formula held as their formula codes (see pykrev.CodedFormula) instead of a list of strings, so more samples fit in the memory budget.
+
+    Methods
+    ----------
+    All msTupleDict methods (e.g. msTupleStore.average(), msTupleStore.intersections(), msTupleStore.to_OrdinationMatrix()),
+    which stream samples from disk one at a time instead of holding the whole cohort in memory.
+
+    msTupleStore.copy(): returns an in memory msTupleDict of all samples, sharing the formula vocabulary of the store.
+
+    msTupleStore.flush(): writes the index of the store to disk, if it has changed since it was last written.
+
+    with msTupleStore(Y) as store: defers writing the index until the end of the block (e.g. when adding many samples). update() and clear() do this automatically.
+
+    msTupleStore.cache_info(): returns a dictionary containing the number of samples and bytes held in memory and the memory budget.
+
+    Info
+    ----------
+    The store directory holds an index of sample names, the shared formula vocabulary (one formula per line) and one .npz file per sample
+    containing its formula codes, intensities and mz values. The formula codes of every sample are kept in memory once read
+    (4 bytes per peak), as they are needed by cohort operations such as find_intersections and ordination_matrix.
+    Samples returned by the store share its formula vocabulary, so msTupleStore.subset() returns an in memory msTupleDict without re-encoding.
+    The store is a mapping (collections.abc.MutableMapping) of sample names to msTuples, not a dict: keys(), values() and items() are views that read samples
+    from disk as they are iterated. A pickled store is reopened from its directory.
+    Outside of a with block the index is written after every change, so the store on disk is always complete.
+    Cohort operations validate each sample as they read it, instead of reading every sample once to validate it and again for the operation.
+    """
+    def __init__(self, path, memory_budget = 2**30, compact = False):
+        self.path = path
+        self.memory_budget = memory_budget
+        self._compact = compact
+        self._cache = OrderedDict()
+        self._cachedBytes = 0
+        self._files = OrderedDict()
+        self._codes = dict()
+        self._batches = 0
+        self._dirty = False
+        self._validateOnRead = False
+        os.makedirs(os.path.join(path, 'samples'), exist_ok = True)
+        vocabulary = self.__dict__['_vocabulary_cache'] = FormulaVocabulary()
+        vocabularyPath = os.path.join(path, 'vocabulary.txt')
+        if os.path.exists(self._index_path()):
+            with open(self._index_path()) as f:
+                index = json.load(f)
+            assert index.get('format') == _FORMAT, f'{path} is not a pykrev store'
+            # json stores tuple sample names as lists
+            self._files = OrderedDict((tuple(name) if isinstance(name, list) else name, file) for name, file in index['samples'])
+            self._next = index['next']
+            with open(vocabularyPath, encoding = 'utf-8') as f:
+                lines = f.read().split('\n')
+            vocabulary.encode(lines[:index['vocabulary_size']])
+            if len(lines) > max(index['vocabulary_size'], 1):
+                # drop formula written by an interrupted write that never reached the index
+                with open(vocabularyPath, 'w', encoding = 'utf-8') as f:
+                    f.write('\n'.join(vocabulary.formula))
+        else:
+            self._next = 0
+            open(vocabularyPath, 'w').close()
+            self._dirty = True
+            self.flush()
+
+    def __repr__(self) -> str:
+        return f'msTupleStore({self.path!r}, {len(self)} samples)'
+
+    def __enter__(self):
+        self._batches += 1
+        return self
+
+    def __exit__(self, *exc):
+        self._batches -= 1
+        if self._batches == 0:
+            self.flush()
+        return False
+
+    def __reduce__(self):
+        self.flush()
+        return (msTupleStore, (self.path, self.memory_budget, self._compact))
+
+    def __len__(self):
+        return len(self._files)
+
+    def __iter__(self):
+        return iter(list(self._files))
+
+    def __contains__(self, key):
+        return key in self._files
+
+    def copy(self):
+        copy = msTupleDict()
+        copy.__dict__['_vocabulary_cache'] = self.vocabulary()
+        if self._compact:
+            copy.compact()
+        copy.update(self.items())
+        return copy
+
+    def __getitem__(self, key):
+        value = self._read(key)
+        if self._validateOnRead:
+            value.validate()
+        return value
+
+    def _read(self, key):
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key][0]
+        if key not in self._files:
+            raise KeyError(key)
+        vocabulary = self.vocabulary()
+        with np.load(os.path.join(self.path, 'samples', self._files[key])) as npz:
+            codes, intensity, mz = npz['codes'], npz['intensity'], npz['mz']
+        codes.flags.writeable = False
+        self._codes[key] = codes
+        formula = CodedFormula(vocabulary, codes) if self._compact else vocabulary.decode(codes)
+        value = msTuple(formula, intensity, mz)._set_codes(vocabulary, codes)
+        self._cache_sample(key, value)
+        return value
+
+    def __setitem__(self, key, value):
+        self._invalidate()
+        vocabulary = self.vocabulary()
+        size = len(vocabulary)
+        if isinstance(value, msTuple) and value.__dict__.get('_vocabulary_cache') is vocabulary:
+            codes = value.formula_codes()
+        else:
+            codes = vocabulary.encode(value[0])
+            codes.flags.writeable = False
+        if len(vocabulary) > size:
+            with open(os.path.join(self.path, 'vocabulary.txt'), 'a', encoding = 'utf-8') as f:
+                f.write(('\n' if size > 0 else '') + '\n'.join(vocabulary.formula[size:]))
+        if key in self._files:
+            self._forget(key)
+            file = self._files[key]
+        else:
+            file = f'{self._next}.npz'
+            self._next += 1
+        np.savez(os.path.join(self.path, 'samples', file), codes = codes, intensity = np.asarray(value[1]), mz = np.asarray(value[2]))
+        self._files[key] = file
+        self._codes[key] = codes
+        self._index_changed()
+
+    def __delitem__(self, key):
+        self._invalidate()
+        if key not in self._files:
+            raise KeyError(key)
+        self._forget(key)
+        os.remove(os.path.join(self.path, 'samples', self._files.pop(key)))
+        self._codes.pop(key, None)
+        self._index_changed()
+
+    def update(self, *args, **kwargs):
+        with self:
+            super().update(*args, **kwargs)
+
+    def clear(self):
+        with self:
+            super().clear()
+
+    @contextlib.contextmanager
+    def _validated(self):
+        # samples are validated as the operation reads them from disk (see __getitem__)
+        self._validateOnRead = True
+        try:
+            yield
+        finally:
+            self._validateOnRead = False
+
+    def _sample_codes(self):
+        for key, file in self._files.items():
+            if key not in self._codes:
+                with np.load(os.path.join(self.path, 'samples', file)) as npz:
+                    codes = npz['codes']
+                codes.flags.writeable = False
+                self._codes[key] = codes
+        return {key: self._codes[key] for key in self._files}
+
+    def cache_info(self):
+        return {'samples': len(self._cache), 'bytes': self._cachedBytes, 'memory_budget': self.memory_budget}
+
+    def _cache_sample(self, key, value):
+        formulaBytes = value.formula.codes.nbytes if isinstance(value.formula, CodedFormula) else 8 * len(value.formula)
+        nbytes = value.intensity.nbytes + value.mz.nbytes + formulaBytes
+        if nbytes > self.memory_budget:
+            return
+        self._cache[key] = (value, nbytes)
+        self._cachedBytes += nbytes
+        while self._cachedBytes > self.memory_budget:
+            _, (_, evicted) = self._cache.popitem(last = False)
+            self._cachedBytes -= evicted
+
+    def _forget(self, key):
+        cached = self._cache.pop(key, None)
+        if cached is not None:
+            self._cachedBytes -= cached[1]
+
+    def _index_path(self):
+        return os.path.join(self.path, 'index.json')
+
+    def _index_changed(self):
+        self._dirty = True
+        if self._batches == 0:
+            self.flush()
+
+    def flush(self):
+        if not self._dirty:
+            return
+        index = {'format': _FORMAT, 'samples': list(self._files.items()), 'next': self._next, 'vocabulary_size': len(self.vocabulary())}
+        temporary = self._index_path() + '.tmp'
+        with open(temporary, 'w') as f:
+            json.dump(index, f)
+        os.replace(temporary, self._index_path())
+        self._dirty = False
@@ -1,5 +1,5 @@
 import numpy as np
-from .element_counts import element_counts
+from .element_matrix import element_matrix, _element_columns
 def nominal_oxidation_state(msTuple):
     """ 
 	Docstring for function pyKrev.nominal_oxidation_state
@@ -35,10 +35,16 @@ def nominal_oxidation_state(msTuple):
 	h = F
         
     """      
-	#Setup
-    count_list = element_counts(msTuple)
-    NOSCs = np.array([])
+    #Setup
+    countMatrix, elementIndex = element_matrix(msTuple)
+    count = _element_columns(countMatrix, elementIndex)
     #Main
-    for i in count_list:
-        NOSCs = np.append(NOSCs,-((4*i['C'] + i['H'] - 3 * i['N'] - 2 * i['O'] + 5 * i['P'] - 2 * i['S'] - i['Cl'] - i['F'])/i['C']) + 4) 
-    return NOSCs
\ No newline at end of file
+    NOSCs = _nominal_oxidation_state(count)
+    return NOSCs
+
+def _nominal_oxidation_state(count):
+    """ Compute the nominal oxidation state of C over whole count columns. Formula without C give np.nan. """
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        NOSCs = -((4*count['C'] + count['H'] - 3 * count['N'] - 2 * count['O'] + 5 * count['P'] - 2 * count['S'] - count['Cl'] - count['F'])/count['C']) + 4
+    NOSCs[count['C'] == 0] = np.nan
+    return NOSCs
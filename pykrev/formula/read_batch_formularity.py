@@ -2,7 +2,7 @@ import pandas as pd
 import numpy as np 
 from .msTuple import msTuple
 from .msTupleDict import msTupleDict
-from ..diversity.ordination_matrix import ordination_matrix
+from .read_formularity import _formula_strings
 def read_batch_formularity(report_name):
     """ 
 	Docstring for function PyKrev.read_batch_formularity
@@ -24,65 +24,50 @@ def read_batch_formularity(report_name):
     Info
     -----------
     PyKrev will filter out formula with 13C assignments
+    Sample columns are found from the report header (all columns after 'Candidates').
+    The sample intensities are held as a sparse (formula x sample) matrix, from which each sample's msTuple is sliced.
     """
-    #Main
-    report = pd.read_csv(report_name)
+    #Setup
+    header = pd.read_csv(report_name, nrows = 0).columns
+    sampleNames = _sample_columns(header)
+    usecols = ['C13','C','H','O','N','S','P','Mass'] + sampleNames
+    report = pd.read_csv(report_name, usecols = lambda column: column in usecols)
     notIsotopologue = report['C13'] == 0 # boolean array of only non isotopologues
-    report = report[notIsotopologue]
-    report.reset_index(drop = True, inplace = True) #reset the index to account for the removed isotopologues]
-    C = report['C']
-    H = report['H']
-    O = report['O']
-    N = report['N'] 
-    S = report['S']
-    P = report['P']
-    #dimensions of report (number of formula, samples)
-    x,y = report.shape
-    #list to store all formula in
-    molecular_formula = []
-    #turn atom numbers into formula strings 
-    for n in range(0,len(C)):
-        if C[n] == 0 and H[n] == 0: #If there isn't a count for C and H don't include the formula
-            temp_formula = np.nan
-        else:
-            temp_formula = 'C'+str(C[n])+'H'+str(H[n]) #add C and H then ... 
-            if N[n] > 0:
-                temp_formula = temp_formula + 'N' + str(N[n])
-            if O[n] > 0:
-                temp_formula = temp_formula + 'O' + str(O[n])
-            if P[n] > 0:
-                temp_formula = temp_formula + 'P' + str(P[n])
-            if S[n] > 0:
-                temp_formula = temp_formula + 'S' + str(S[n])
-        molecular_formula.append(temp_formula)
-    #convert to numpy array so we can use boolean indexing
-    molecular_formula = np.array(molecular_formula)
-    #remove nan values
-    filter_formula = molecular_formula[molecular_formula != 'nan']
-    #add to the original dataframe to preserve indexing
-    report['all_formula'] = molecular_formula
-    #make new dataframe
-    formulaData = pd.DataFrame(index=None)
-    #copy across formula, mass, cclass and mass error data with boolean indexing
-    formulaData['formula'] = report['all_formula'][molecular_formula != 'nan']
-    formulaData['mass'] = report['Mass'][molecular_formula != 'nan']
-    formulaData['cclass'] = report['Class'][molecular_formula != 'nan']
-    formulaData['massError'] = report['Error_ppm'][molecular_formula != 'nan']
-    spectraNames = []
-    spectraFormula = []
-    spectraIntensities = []
-    #column 15 is the first sample ID column
-    for i in range(14,y):
-        #save the peak intensities after boolean indexing has been applied
-        intensity = report.iloc[:,i][molecular_formula != 'nan']
-        formulaData[report.columns[i]] = intensity
-        spectraNames.append(report.columns[i])
-        spectraIntensities.append(np.array(intensity[intensity > 0]))
-        spectraFormula.append(list(filter_formula[intensity > 0]))
-    #Now process the formulaData into an msTuple dictionary 
-    batchDict = msTupleDict()
-    x,y = formulaData.shape
-    sampleNames = formulaData.columns[4::]
+    hasCH = (report['C'] != 0) | (report['H'] != 0) #If there isn't a count for C and H don't include the formula
+    report = report[notIsotopologue & hasCH]
+    report.reset_index(drop = True, inplace = True) #reset the index to account for the removed rows
+    #Main
+    from scipy import sparse # imported here so that importing pykrev does not load scipy
+    molecular_formula = _formula_strings(report, ['C','H','N','O','P','S'], always = ['C','H'])
+    mass = report['Mass'].to_numpy(dtype = float)
+    #build the (formula x sample) sparse intensity matrix one sample column at a time, keeping only positive intensities,
+    #so that the dense intensity block is never copied out of the report
+    rowIndices, values = [], []
     for name in sampleNames:
-        batchDict[name] = msTuple(list(formulaData['formula'][formulaData[name] > 0]), np.array(formulaData[name][formulaData[name] > 0]), np.array(formulaData['mass'][formulaData[name] > 0]))
+        column = report[name].to_numpy()
+        rows = np.flatnonzero(column > 0)
+        rowIndices.append(rows)
+        values.append(column[rows])
+    indptr = np.concatenate([[0], np.cumsum([len(rows) for rows in rowIndices])])
+    data = np.concatenate(values) if values else np.zeros(0)
+    indices = np.concatenate(rowIndices) if rowIndices else np.zeros(0, dtype = np.intp)
+    intensities = sparse.csc_matrix((data, indices, indptr), shape = (len(report), len(sampleNames)))
+    #slice each sample's msTuple from its column of the sparse matrix, the formula are encoded once into the vocabulary of the msTupleDict
+    batchDict = msTupleDict()
+    vocabulary = batchDict.vocabulary()
+    formulaCodes = vocabulary.encode(molecular_formula)
+    for j, name in enumerate(sampleNames):
+        rows = intensities.indices[intensities.indptr[j]:intensities.indptr[j+1]]
+        intensity = intensities.data[intensities.indptr[j]:intensities.indptr[j+1]].astype(report[name].dtype)
+        codes = formulaCodes[rows]
+        codes.flags.writeable = False
+        batchDict[name] = msTuple(vocabulary.decode(codes), intensity, mass[rows])._set_codes(vocabulary, codes)
     return batchDict
+
+_REPORT_COLUMNS = ['Mass','C','H','O','N','C13','S','P','Na','El_comp','Class','NeutralMass','Error_ppm','Candidates']
+def _sample_columns(header):
+    """ Return the sample columns of a formularity batch report header: the columns after 'Candidates', or if there is no 'Candidates' column the columns that are not report columns. """
+    header = list(header)
+    if 'Candidates' in header:
+        return header[header.index('Candidates') + 1:]
+    return [column for column in header if column not in _REPORT_COLUMNS]
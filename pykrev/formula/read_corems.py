@@ -1,7 +1,8 @@
 import pandas as pd
 import numpy as np 
 from .msTuple import msTuple
-def read_corems(corems_df, mass_type = 'calibrated', remove_multiply_assigned_peaks = True, verbose = False):
+from .read_formularity import _formula_strings
+def read_corems(corems_df, mass_type = 'calibrated', remove_multiply_assigned_peaks = True, verbose = False, best_candidate = None):
     """ 
     Docstring for function PyKrev.read_corems
     ====================
@@ -22,6 +23,10 @@ def read_corems(corems_df, mass_type = 'calibrated', remove_multiply_assigned_pe
     remove_multiply_assigned_peaks: bool, if True remove peaks that have multiple formulae assigned to them. 
         if False msTuple will contain multiple formulae assignments
     verbose: bool, if True print number of assigned peaks and generated formulae to output
+    best_candidate: String, if given keep only the best formula assigned to each multiply assigned peak instead of removing the peak. One of:
+        'Confidence Score' (keep the formula with the highest confidence score),
+        'm/z Error (ppm)' (keep the formula with the lowest absolute m/z error).
+        Overrides remove_multiply_assigned_peaks. Ties are resolved in favour of the first formula listed.
 
     Info
     -----------    
@@ -31,6 +36,7 @@ def read_corems(corems_df, mass_type = 'calibrated', remove_multiply_assigned_pe
     #Tests
     assert(mass_type in ['calculated','calibrated','experimental']), 'incorrect mass_type given'
     assert(type(remove_multiply_assigned_peaks) == bool), 'provide a boolean'
+    assert(best_candidate in [None,'Confidence Score','m/z Error (ppm)']), 'incorrect best_candidate given'
     #Setup
     assigned = corems_df['Is Isotopologue'] == 0
     assignedDf = corems_df[assigned].copy()
@@ -43,108 +49,32 @@ def read_corems(corems_df, mass_type = 'calibrated', remove_multiply_assigned_pe
         print(f'generated formulae: {generated_formulae_number}')
         print('**************************************************')
     #deal with multiple assignments
-    if generated_formulae_number > assigned_peak_number:
-        if remove_multiply_assigned_peaks == True:
-            didx = pd.Index([])
-            for i in assignedDf['Index']:
-                if len(assignedDf[assignedDf['Index'] == i]) > 1: 
-                    didx = didx.union(assignedDf[assignedDf['Index'] == i].index)
-            assignedDf = assignedDf.drop(index = didx)
+    if best_candidate is not None:
+        score = assignedDf[best_candidate]
+        if best_candidate == 'm/z Error (ppm)':
+            score = -score.abs()
+        ## rank the formulae of each peak by score (stable, so ties keep their original order) and keep the first
+        ranked = assignedDf.assign(_score = score).sort_values(['Index','_score'], ascending = [True,False], kind = 'mergesort', na_position = 'last')
+        best = ranked.index[~ranked['Index'].duplicated(keep = 'first')]
+        assignedDf = assignedDf[assignedDf.index.isin(best)]
+    elif remove_multiply_assigned_peaks == True:
+        assignedDf = assignedDf[~assignedDf['Index'].duplicated(keep = False)]
     N = assignedDf.shape[0]
-    if verbose == True and remove_multiply_assigned_peaks == True:
+    if verbose == True and best_candidate is not None:
+        print(f'{generated_formulae_number - N} lower ranked formulae of multiply assigned peaks removed')
+        print('----------------------------------------------------')
+    elif verbose == True and remove_multiply_assigned_peaks == True:
         print(f'{assigned_peak_number - N} multiply assigned peaks removed')
         print('----------------------------------------------------')
     #Main
-    ## first check that there are columns in the dataframe corresponding to C,H,N,O,P,S,Cl and F if there aren't, we make them!
-    if 'C' not in assignedDf.columns:
-        assignedDf['C'] = [""] * N
-    if 'H' not in assignedDf.columns:
-        assignedDf['H'] = [""] * N
-    if 'N' not in assignedDf.columns:
-        assignedDf['N'] = [""] * N      
-    if 'O' not in assignedDf.columns:
-        assignedDf['O'] = [""] * N           
-    if 'S' not in assignedDf.columns:
-        assignedDf['S'] = [""] * N       
-    if 'P' not in assignedDf.columns:
-        assignedDf['P'] = [""] * N    
-    if 'Cl' not in assignedDf.columns:
-        assignedDf['Cl'] = [""] * N       
-    if 'F' not in assignedDf.columns:
-        assignedDf['F'] = [""] * N  
-    Cstring = []
-    for cnumber in assignedDf['C']:
-        try: 
-            if int(cnumber) == 0:
-                Cstring.append("")
-            else:
-                Cstring.append(str(f"C{int(cnumber)}"))
-        except ValueError:
-            Cstring.append("")
-    Hstring = [] 
-    for hnumber in assignedDf['H']:
-        try: 
-            if int(hnumber) == 0:
-                Hstring.append("")
-            else:
-                Hstring.append(str(f"H{int(hnumber)}"))
-        except ValueError:
-            Hstring.append("")        
-    Nstring = [] 
-    for nnumber in assignedDf['N']:
-        try:
-            if int(nnumber) == 0:
-                Nstring.append("")
-            else:
-                Nstring.append(str(f"N{int(nnumber)}"))
-        except ValueError:
-            Nstring.append("")
-    Ostring = [] 
-    for onumber in assignedDf['O']:
-        try:
-            if int(onumber) == 0:
-                Ostring.append("")
-            else:
-                Ostring.append(str(f"O{int(onumber)}"))
-        except ValueError:
-            Ostring.append("")
-    Pstring = []
-    for pnumber in assignedDf['P']:
-        try:
-            if int(pnumber) == 0:
-                Pstring.append("")
-            else: 
-                Pstring.append(str(f"P{int(pnumber)}"))
-        except ValueError:
-            Pstring.append("") 
-    Sstring = [] 
-    for snumber in assignedDf['S']:
-        try:
-            if int(snumber) == 0:
-                Sstring.append("")
-            else: 
-                Sstring.append(str(f"S{int(snumber)}"))
-        except ValueError:
-            Sstring.append("")
-    Clstring = []
-    for clnumber in assignedDf['Cl']:
-        try:
-            if int(clnumber) == 0:
-                Clstring.append("")
-            else: 
-                Clstring.append(str(f"Cl{int(clnumber)}"))
-        except ValueError:
-            Clstring.append("")
-    Fstring = [] 
-    for fnumber in assignedDf['F']:
-         try:
-             if int(fnumber) == 0:
-                 Fstring.append("")
-             else: 
-                 Fstring.append(str(f"F{int(fnumber)}"))
-         except ValueError:
-             Fstring.append("")
-    pykrev_formula = [c + h + n + o + p + s + f + cl for c, h, n, o, p, s, f, cl in zip(Cstring, Hstring, Nstring, Ostring, Pstring, Sstring, Fstring, Clstring)]
+    ## element counts that are missing or can't be read as numbers are not written, as are zero counts
+    counts = pd.DataFrame(index = assignedDf.index)
+    for element in ['C','H','N','O','P','S','F','Cl']:
+        if element in assignedDf.columns:
+            counts[element] = pd.to_numeric(assignedDf[element], errors = 'coerce').fillna(0).astype(np.int64)
+        else:
+            counts[element] = 0
+    pykrev_formula = _formula_strings(counts, ['C','H','N','O','P','S','F','Cl'])
     pykrev_abundance = assignedDf['Peak Height']
     if mass_type == 'calibrated':
         pykrev_mass = assignedDf['Calibrated m/z']
@@ -153,3 +83,44 @@ def read_corems(corems_df, mass_type = 'calibrated', remove_multiply_assigned_pe
     else:
         pykrev_mass = assignedDf['m/z']
     return msTuple(pykrev_formula, np.array(pykrev_abundance), np.array(pykrev_mass))
+
+def iter_corems(Y, chunksize = 100000, **kwargs):
+    """ 
+    Docstring for function PyKrev.iter_corems
+    ====================
+    This function reads a csv file written from a corems dataframe (mass_spectrum_obj.to_dataframe().to_csv()) in chunks of rows, yielding one msTuple per chunk.
+    
+    Use
+    ----
+    iter_corems(Y)
+    
+    Returns a generator of msTuples, each containing the formulae assigned in about chunksize rows of the file, in file order.
+    
+    Parameters
+    ----------
+    Y: String, path to the .csv file.
+    chunksize: int, the number of rows read from the file at once.
+    **kwargs: key word arguments passed to pykrev.read_corems for each chunk, e.g. mass_type = 'experimental' or best_candidate = 'Confidence Score'.
+
+    Info
+    -----------
+    The rows of a peak (the same 'Index'), which corems writes one after another, are kept together: rows of the last peak in a chunk are carried over to the next chunk,
+    so that multiply assigned peaks are handled exactly as by read_corems. Chunks without any assigned formulae are not yielded.
+    """
+    #Tests
+    assert chunksize >= 1, 'chunksize must be at least 1'
+    #Main
+    carried = None
+    with pd.read_csv(Y, chunksize = chunksize) as chunks:
+        for chunk in chunks:
+            if carried is not None:
+                chunk = pd.concat([carried, chunk], ignore_index = True)
+            lastPeak = chunk['Index'].to_numpy() == chunk['Index'].iloc[-1]
+            carried = chunk[lastPeak]
+            msTupleObj = read_corems(chunk[~lastPeak], **kwargs)
+            if len(msTupleObj.formula) > 0:
+                yield msTupleObj
+    if carried is not None and len(carried) > 0:
+        msTupleObj = read_corems(carried, **kwargs)
+        if len(msTupleObj.formula) > 0:
+            yield msTupleObj
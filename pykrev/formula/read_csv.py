@@ -24,5 +24,40 @@ def read_csv(Y, column_headers = False):
         data = pd.read_csv(Y, header = None)
     else:
         data = pd.read_csv(Y)
-    msTupleObj = msTuple(list(data.iloc[:,0]),np.array(data.iloc[:,1]),np.array(data.iloc[:,2]))
-    return msTupleObj
\ No newline at end of file
+    return _table_to_mstuple(data)
+
+def iter_csv(Y, column_headers = False, chunksize = 100000):
+    """ 
+    Docstring for function pykrev.iter_csv
+    ==========
+    Reads an assigned mass list from a .csv file in chunks of rows, yielding one msTuple per chunk. 
+    
+    Use 
+    ----------
+    iter_csv(Y)
+    
+    Returns a generator of msTuples, each containing at most chunksize rows of the file, in file order. 
+    
+    Parameters 
+    ----------
+    Y:  String, path to the .csv file. 
+        The .csv file should have three columns in the following order: formula, intensity and mass.
+    
+    column_headers: Bool, does the .csv file include column headers?
+
+    chunksize: int, the maximum number of rows read into memory at once.
+
+    Info
+    ----------
+    Only one chunk is held in memory at a time, so files larger than memory can be filtered and summarised chunk by chunk, e.g.
+    for chunk in iter_csv(Y): chunk = chunk.filter_mz(200,700); table = descriptors(chunk.formula) ...
+    """
+    #Tests
+    assert chunksize >= 1, 'chunksize must be at least 1'
+    #Main
+    with pd.read_csv(Y, header = None if column_headers == False else 'infer', chunksize = chunksize) as chunks:
+        for data in chunks:
+            yield _table_to_mstuple(data)
+
+def _table_to_mstuple(data):
+    return msTuple(list(data.iloc[:,0]),np.array(data.iloc[:,1]),np.array(data.iloc[:,2]))
@@ -0,0 +1,91 @@
+import os
+import glob
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from .read_csv import read_csv
+from .read_formularity import read_formularity
+from .read_corems import read_corems
+from .msTupleDict import msTupleDict
+def read_directory(pattern, reader = 'csv', n_jobs = None, verbose = True, return_errors = False, **kwargs):
+    """
+    Docstring for function pykrev.read_directory
+    ==========
+    Reads many assigned mass list files into an msTupleDict, parsing the files in parallel in a pool of processes.
+
+    Use
+    ----------
+    read_directory(Y)
+
+    Returns an msTupleDict with the file names (without extension) as keys and the corresponding msTuples as values, in file name order.
+    If return_errors is True returns a tuple containing (i) the msTupleDict and (ii) a dictionary with the paths of the files that could not be read
+    as keys and the error messages as values.
+
+    Parameters
+    ----------
+    Y: String, a directory (all .csv files in the directory are read) or a glob pattern, e.g. 'data/*_assigned.csv'.
+
+    reader: String, the reader used for each file. One of:
+        'csv' - see pykrev.read_csv
+        'formularity' - see pykrev.read_formularity
+        'corems' - the file is a csv file written from a corems dataframe, see pykrev.read_corems
+
+    n_jobs: int, the number of processes to use. If None all cpu cores are used. If 1 the files are read one after another in the current process.
+
+    verbose: bool, if True print the number of files read and any errors.
+
+    return_errors: bool, if True also return the errors.
+
+    **kwargs: key word arguments passed to the reader, e.g. column_headers = True for 'csv' or best_candidate = 'Confidence Score' for 'corems'.
+
+    Info
+    ----------
+    Each file is read and parsed in a worker process, so reading from disk in one worker overlaps with parsing in another.
+    A file that raises an error is reported and left out of the msTupleDict, the rest of the batch is still read.
+    """
+    #Tests
+    assert reader in _READERS, f"reader must be one of {list(_READERS)}"
+    assert n_jobs is None or n_jobs >= 1, 'n_jobs must be at least 1'
+    assert 'return_metadata' not in kwargs, 'return_metadata is not supported by read_directory'
+    #Setup
+    if os.path.isdir(pattern):
+        pattern = os.path.join(pattern, '*.csv')
+    paths = sorted(glob.glob(pattern))
+    names = [os.path.splitext(os.path.basename(path))[0] for path in paths]
+    assert len(set(names)) == len(names), 'file names (without extension) must be unique'
+    if n_jobs is None:
+        n_jobs = os.cpu_count() or 1
+    n_jobs = min(n_jobs, max(len(paths), 1))
+    jobs = [(path, reader, kwargs) for path in paths]
+    #Main
+    if n_jobs == 1:
+        results = [_read_file(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers = n_jobs) as executor:
+            results = list(executor.map(_read_file, jobs, chunksize = max(1, len(jobs) // (4 * n_jobs))))
+    batchDict = msTupleDict()
+    errors = dict()
+    for name, path, (msTupleObj, error) in zip(names, paths, results):
+        if error is None:
+            batchDict[name] = msTupleObj
+        else:
+            errors[path] = error
+    if verbose == True:
+        print(f'{len(batchDict)} of {len(paths)} files read')
+        for path, error in errors.items():
+            print(f'Error: could not read {path}: {error}')
+    if return_errors:
+        return batchDict, errors
+    return batchDict
+
+def _read_corems_csv(path, **kwargs):
+    return read_corems(pd.read_csv(path), **kwargs)
+
+_READERS = {'csv': read_csv, 'formularity': read_formularity, 'corems': _read_corems_csv}
+
+def _read_file(job):
+    """ Read a single file in a worker process. Returns (msTuple, None) or (None, error message). """
+    path, reader, kwargs = job
+    try:
+        return _READERS[reader](path, **kwargs), None
+    except Exception as error:
+        return None, f'{type(error).__name__}: {error}'
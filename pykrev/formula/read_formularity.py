@@ -1,7 +1,7 @@
 import pandas as pd
 import numpy as np 
 from .msTuple import msTuple
-def read_formularity(report_name,pi_col = []):
+def read_formularity(report_name,pi_col = [], return_metadata = False, dtype = None):
     """ 
 	Docstring for function PyKrev.read_formularity
 	====================
@@ -11,53 +11,83 @@ def read_formularity(report_name,pi_col = []):
 	----
 	read_formularity(report_name)
     
-	Returns an msTuple. 
+	Returns an msTuple. If return_metadata is True returns a tuple containing (i) the msTuple and (ii) a pandas.DataFrame
+    with the 'Error_ppm' and 'Class' columns of the report, in which row i corresponds to formula i of the msTuple.
 
 	Parameters
 	----------
 	report_name: name of csv file that the formularity report to be read is saved as. 
 	pi_col: name of the column in that file that peak intensities are found in. If not given the last column is used. 
+    return_metadata: boolean, if True also return the mass error and compound class of each formula.
+    dtype: dictionary of column name : type hints passed to pandas.read_csv, e.g. {'Mass': 'float64', 'C': 'int16'}
 
     Note: PyKrev will filter out formula with 13C assignments
+    Info: only the columns used by the reader are parsed from the csv file.
     """
-    report = pd.read_csv(report_name)
-    notIsotopologue = report['C13'] == 0 # boolean array of only non isotopologues
-    report = report[notIsotopologue]
-    report.reset_index(drop = True, inplace = True) #reset the index to account for the removed isotopologues
-    C = report['C']
-    H = report['H']
-    O = report['O']
-    N = report['N'] 
-    S = report['S']
-    P = report['P']
+    pi_col, usecols = _report_columns(report_name, pi_col)
+    report = pd.read_csv(report_name, usecols = usecols, dtype = dtype)
+    return _report_to_mstuple(report, pi_col, return_metadata)
+
+def iter_formularity(report_name, pi_col = [], return_metadata = False, dtype = None, chunksize = 100000):
+    """ 
+	Docstring for function PyKrev.iter_formularity
+	====================
+	This function reads the report csv file produced by formularity software in chunks of rows, yielding one msTuple per chunk.
+    
+	Use
+	----
+	iter_formularity(report_name)
+    
+	Returns a generator of msTuples, each containing the formulae assigned in at most chunksize rows of the report, in file order.
+    If return_metadata is True the generator yields tuples of (msTuple, pandas.DataFrame), see pykrev.read_formularity.
+
+	Parameters
+	----------
+	report_name: name of csv file that the formularity report to be read is saved as. 
+	pi_col: name of the column in that file that peak intensities are found in. If not given the last column is used. 
+    return_metadata: boolean, if True also yield the mass error and compound class of each formula.
+    dtype: dictionary of column name : type hints passed to pandas.read_csv, e.g. {'Mass': 'float64', 'C': 'int16'}
+    chunksize: int, the maximum number of report rows read into memory at once.
+
+    Note: PyKrev will filter out formula with 13C assignments, so chunks can contain fewer than chunksize formulae.
+    Info: only one chunk is held in memory at a time, so reports larger than memory can be filtered and summarised chunk by chunk.
+    """
+    assert chunksize >= 1, 'chunksize must be at least 1'
+    pi_col, usecols = _report_columns(report_name, pi_col)
+    with pd.read_csv(report_name, usecols = usecols, dtype = dtype, chunksize = chunksize) as chunks:
+        for report in chunks:
+            yield _report_to_mstuple(report, pi_col, return_metadata)
+
+def _report_columns(report_name, pi_col):
+    """ Return the peak intensity column and the column selector for the columns of a formularity report used by the readers. """
+    header = pd.read_csv(report_name, nrows = 0).columns
     if not pi_col: 
-        I = report.iloc[:,-1] #take the final column of the report file to contain peak intensities. Not sure how stable this is.
-    else:
-        I = report[pi_col] #user supplied a column name for the peak intensities.
-    MZ = report['Mass']
-    G = report['Class']
-    ME = report['Error_ppm']
-    molecular_formula = []
-    mass_charge = np.array([])
-    mass_error = np.array([])
-    peak_intensities = np.array([])
-    compound_class = []
-    for n in range(0,len(C)):
-        if C[n] == 0 and H[n] == 0: #If there isn't a count for C and H don't include the formula
-            pass
-        else:
-            temp_formula = 'C'+str(C[n])+'H'+str(H[n]) #add C and H then ... 
-            if N[n] > 0:
-                temp_formula = temp_formula + 'N' + str(N[n])
-            if O[n] > 0:
-                temp_formula = temp_formula + 'O' + str(O[n])
-            if P[n] > 0:
-                temp_formula = temp_formula + 'P' + str(P[n])
-            if S[n] > 0:
-                temp_formula = temp_formula + 'S' + str(S[n])
-            molecular_formula.append(temp_formula)
-            peak_intensities = np.append(peak_intensities,I[n])
-            mass_charge =  np.append(mass_charge,MZ[n])
-            mass_error = np.append(mass_error,ME[n])
-            compound_class.append(G[n])
-    return msTuple(molecular_formula, peak_intensities, mass_charge) #return an msTuple
\ No newline at end of file
+        pi_col = header[-1] #take the final column of the report file to contain peak intensities. Not sure how stable this is.
+    usecols = ['C13','C','H','O','N','S','P','Mass','Class','Error_ppm'] + [pi_col]
+    return pi_col, lambda column: column in usecols
+
+def _report_to_mstuple(report, pi_col, return_metadata):
+    notIsotopologue = report['C13'] == 0 # boolean array of only non isotopologues
+    hasCH = (report['C'] != 0) | (report['H'] != 0) #If there isn't a count for C and H don't include the formula
+    report = report[notIsotopologue & hasCH]
+    report = report.reset_index(drop = True) #reset the index to account for the removed rows
+    molecular_formula = _formula_strings(report, ['C','H','N','O','P','S'], always = ['C','H'])
+    peak_intensities = report[pi_col].to_numpy(dtype = float)
+    mass_charge = report['Mass'].to_numpy(dtype = float)
+    if return_metadata:
+        metadata = report[['Error_ppm','Class']].copy()
+        return msTuple(molecular_formula, peak_intensities, mass_charge), metadata
+    return msTuple(molecular_formula, peak_intensities, mass_charge) #return an msTuple
+
+def _formula_strings(table, elements, always = []):
+    """ Assemble a list of formula strings column-wise from the element count columns of a pandas.DataFrame, in the order of elements.
+        Elements in always are written even when their count is zero, other elements are only written when their count is > 0.
+        Counts are written as str() of the column values, so float columns give e.g. 'C12.0'. """
+    formula = pd.Series('', index = table.index, dtype = object)
+    for element in elements:
+        counts = table[element]
+        text = element + counts.astype(str)
+        if element not in always:
+            text = text.where(counts > 0, '')
+        formula = formula + text
+    return formula.tolist()
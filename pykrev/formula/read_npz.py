@@ -0,0 +1,110 @@
+import json
+import zipfile
+import numpy as np
+import pandas as pd
+from .msTuple import msTuple
+from .msTupleDict import msTupleDict
+from .formula_vocabulary import FormulaVocabulary
+_FORMAT = 'pykrev-npz-1'
+def read_npz(Y, mmap = False):
+    """
+    Docstring for function pykrev.read_npz
+    ==========
+    Reads an msTuple or an msTupleDict from a binary .npz file written by msTuple.to_npz or msTupleDict.to_npz.
+
+    Use
+    ----------
+    read_npz(Y)
+
+    Returns an msTuple or an msTupleDict, depending on which was written to the file.
+
+    Parameters
+    ----------
+    Y: String, path to the .npz file.
+
+    mmap: bool, if True the intensity, mz and formula code arrays are memory mapped from the file instead of being read into memory.
+        The msTuple arrays are then read only views of the file, which must not be modified or deleted while they are in use.
+
+    Info
+    ----------
+    The file holds the formula vocabulary once, the formula codes, intensities and mz values of all samples as single contiguous arrays
+    and, if they were saved, the descriptor tables of the vocabulary (see pykrev.FormulaVocabulary.descriptors).
+    Formula strings are rebuilt from the vocabulary, numeric arrays are read without any text parsing.
+    """
+    #Setup
+    if mmap == True:
+        arrays = _memmap_npz(Y)
+    else:
+        with np.load(Y, allow_pickle = False) as npz:
+            arrays = {key: npz[key] for key in npz.files}
+    header = json.loads(_bytes_to_str(arrays['header']))
+    assert header.get('format') == _FORMAT, f'{Y} is not a pykrev .npz file'
+    vocabulary = FormulaVocabulary(_bytes_to_str(arrays['vocabulary']).split('\n') if header['vocabulary_size'] > 0 else [])
+    for names in header['descriptors']:
+        vocabulary._tables[tuple(names)] = pd.DataFrame({name: arrays[f'descriptor:{name}'] for name in names})
+    codes = arrays['codes']
+    intensity = arrays['intensity']
+    mz = arrays['mz']
+    offsets = arrays['offsets']
+    #Main
+    samples = []
+    for i in range(len(header['names'])):
+        start, stop = int(offsets[i]), int(offsets[i+1])
+        sampleCodes = codes[start:stop]
+        samples.append(msTuple(vocabulary.decode(sampleCodes), intensity[start:stop], mz[start:stop])._set_codes(vocabulary, sampleCodes))
+    if header['kind'] == 'msTuple':
+        return samples[0]
+    batchDict = msTupleDict()
+    batchDict.__dict__['_vocabulary_cache'] = vocabulary
+    for name, sample in zip(header['names'], samples):
+        batchDict[name] = sample
+    return batchDict
+
+def _write_npz(path, kind, names, samples, vocabulary, descriptors):
+    """ Write msTuples that share a vocabulary to an uncompressed .npz file. samples is a list of (codes, intensity, mz) tuples. """
+    if descriptors:
+        # the names of several descriptor tables may be given as a list of lists
+        tables = descriptors if isinstance(descriptors[0], (list, tuple)) else [descriptors]
+    else:
+        tables = []
+    arrays = dict()
+    header = {'format': _FORMAT, 'kind': kind, 'names': list(names), 'vocabulary_size': len(vocabulary), 'descriptors': [list(t) for t in tables]}
+    arrays['header'] = _str_to_bytes(json.dumps(header))
+    arrays['vocabulary'] = _str_to_bytes('\n'.join(vocabulary.formula))
+    arrays['codes'] = np.concatenate([np.asarray(codes, dtype = np.int32) for codes, _, _ in samples] + [np.empty(0, dtype = np.int32)])
+    arrays['intensity'] = np.concatenate([np.asarray(intensity) for _, intensity, _ in samples] + [np.empty(0)])
+    arrays['mz'] = np.concatenate([np.asarray(mz) for _, _, mz in samples] + [np.empty(0)])
+    arrays['offsets'] = np.cumsum([0] + [len(codes) for codes, _, _ in samples], dtype = np.int64)
+    for names in tables:
+        table = vocabulary._descriptor_table(names)
+        for name in names:
+            arrays[f'descriptor:{name}'] = table[name].to_numpy()
+    np.savez(path, **arrays)
+
+def _str_to_bytes(string):
+    return np.frombuffer(string.encode('utf-8'), dtype = np.uint8)
+
+def _bytes_to_str(array):
+    return np.asarray(array).tobytes().decode('utf-8')
+
+def _memmap_npz(path):
+    """ Memory map every array of an uncompressed .npz file, using the offset of each .npy member within the zip archive. """
+    arrays = dict()
+    with zipfile.ZipFile(path) as archive, open(path, 'rb') as f:
+        for info in archive.infolist():
+            assert info.compress_type == zipfile.ZIP_STORED, 'compressed .npz files can not be memory mapped'
+            # skip the local file header, whose name and extra field lengths can differ from the central directory
+            f.seek(info.header_offset + 26)
+            nameLength, extraLength = np.frombuffer(f.read(4), dtype = '<u2')
+            f.seek(info.header_offset + 30 + int(nameLength) + int(extraLength))
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            key = info.filename[:-4] if info.filename.endswith('.npy') else info.filename
+            if np.prod(shape) == 0:
+                arrays[key] = np.empty(shape, dtype = dtype)
+            else:
+                arrays[key] = np.memmap(path, dtype = dtype, mode = 'r', offset = f.tell(), shape = shape, order = 'F' if fortran_order else 'C')
+    return arrays
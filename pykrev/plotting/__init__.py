@@ -1,10 +1,27 @@
-from .multi_van_krevelen_plot import multi_van_krevelen_plot
-from .van_krevelen_histogram import van_krevelen_histogram 
-from .van_krevelen_plot import van_krevelen_plot 
-from .kendrick_mass_defect_plot import kendrick_mass_defect_plot
-from .atomic_class_plot import atomic_class_plot
-from .compound_class_plot import compound_class_plot
-from .mass_histogram import mass_histogram
-from .mass_spectrum import mass_spectrum
-from .reaction_network import reaction_network
-from .spiral_plot import spiral_plot
\ No newline at end of file
+import importlib
+import types
+# functions are imported from their modules when first used, so that importing pykrev does not load matplotlib, scipy and networkx
+__all__ = ['multi_van_krevelen_plot',
+           'van_krevelen_histogram',
+           'van_krevelen_plot',
+           'kendrick_mass_defect_plot',
+           'atomic_class_plot',
+           'compound_class_plot',
+           'mass_histogram',
+           'mass_spectrum',
+           'reaction_network',
+           'spiral_plot']
+
+def __getattr__(name):
+    if name in __all__:
+        importlib.import_module(f'.{name}', __name__)
+        # importing a module binds it, and any module it imports from this package, as a package attribute: replace them with their functions
+        for loaded in __all__:
+            value = globals().get(loaded)
+            if isinstance(value, types.ModuleType):
+                globals()[loaded] = getattr(value, loaded)
+        return globals()[name]
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
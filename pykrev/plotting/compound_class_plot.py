@@ -1,4 +1,4 @@
-from ..diversity.compound_class import compound_class
+from ..diversity import compound_class
 from matplotlib import pyplot as plt
 import pandas as pd
 import numpy as np
@@ -50,12 +50,12 @@ def mass_histogram(msTuple,
     assert method in ['monoisotopic','average','nominal','mz','me'], 'Provide a valid method. See docstring for info.'
     #Setup
     mz_list = msTuple[2]
-    expected_mass = calculate_mass(msTuple, method = 'monoisotopic', ion_charge = ion_charge, protonated = protonated)
-    me_list = (expected_mass - mz_list)/mz_list * 1e6
     if method == 'mz':
         assert len(mz_list) > 1, 'provide a list of mz values'
         mass = mz_list
     elif method == 'me':
+        expected_mass = calculate_mass(msTuple, method = 'monoisotopic', ion_charge = ion_charge, protonated = protonated)
+        me_list = (expected_mass - mz_list)/mz_list * 1e6
         assert len(me_list) > 1, 'provide a list of mass error values'
         mass = me_list
     else: 
@@ -1,6 +1,7 @@
 from numpy.lib.function_base import _rot90_dispatcher, rot90
-from ..diversity.normalise_intensity import normalise_intensity
+from ..diversity import normalise_intensity
 from ..formula.calculate_mass import calculate_mass
+from ..formula.msTuple import _mz_order
 from matplotlib import pyplot as plt
 import pandas as pd
 import numpy as np
@@ -59,16 +60,15 @@ def mass_spectrum(msTuple,
         peak_intensities = np.log(peak_intensities)
     if method == 'mz':
         mass = mz_list
+        sortIdx = _mz_order(msTuple)
     else: 
         mass = calculate_mass(msTuple, method = method)
+        sortIdx = np.argsort(mass, kind = 'stable')
+    mass = np.asarray(mass)[sortIdx]
+    peak_intensities = np.asarray(peak_intensities)[sortIdx]
     if len(invertedAxis) > 0:
         assert len(invertedAxis) == len(peak_intensities), 'inverted data must be the same length as peak intensity array'
-        peak_intensities = [x for _,x,_ in sorted(zip(mass,peak_intensities, invertedAxis))]
-        mass = [y for y,_,_ in sorted(zip(mass,peak_intensities, invertedAxis))]
-        invertedAxis = [z for _,_,z in sorted(zip(mass,peak_intensities, invertedAxis))]
-    else:
-        peak_intensities = [x for _,x in sorted(zip(mass,peak_intensities))]
-        mass = [y for y,_ in sorted(zip(mass,peak_intensities))]
+        invertedAxis = np.asarray(invertedAxis)[sortIdx]
     assert len(peak_intensities) == len(mass)
     ## create plotting mass and plotting peak intensity variables 
     ### step size should be based on the precision of the masses
@@ -1,17 +1,7 @@
 from ..formula.calculate_mass import calculate_mass
 import networkx as nx
 import numpy as np
-def reaction_network(msTuple, filePath = '', fileFormat = 'none', reactionDict = {
-                                            'decarboxylation': -calculate_mass(['CO2']),
-                                            'methylation': calculate_mass(['CH2']),
-                                            'demethylation': -calculate_mass(['CH2']),
-                                            'hydrogenation': calculate_mass(['H2']),
-                                            'dehydrogenation': -calculate_mass(['H2']),
-                                            'hydration': calculate_mass(['H2O']),
-                                            'dehydration': -calculate_mass(['H2O']),
-                                            'oxidation': calculate_mass(['O']),
-                                            'reduction': -calculate_mass(['O'])
-                                            }, nodeAnnotations = {}, roundVal = 8):
+def reaction_network(msTuple, filePath = '', fileFormat = 'none', reactionDict = None, nodeAnnotations = {}, roundVal = 8):
     """ 
 	Docstring for function PyKrev.reaction_network
 	====================
@@ -30,6 +20,7 @@ def reaction_network(msTuple, filePath = '', fileFormat = 'none', reactionDict =
 	----------
 	Y: msTuple
     reactionDict: dictionary, containing reaction names as keys and their associated change in monoisotopic formula mass as values.
+        If not provided decarboxylation, (de)methylation, (de)hydrogenation, (de)hydration, oxidation and reduction are used.
     nodeAnnotations: dictionary, containing the node annotation names as keys, and their associated values as numpy arrays. e.g. {'Peak Intensity': intensityArray)
         where len(intensityArray) == len(formulaList)
     filePath: string, directory location to write the graph file to.
@@ -37,6 +28,18 @@ def reaction_network(msTuple, filePath = '', fileFormat = 'none', reactionDict =
     roundVal: int, number of decimal places to round to in the mass defect calculation, default is 8
     """ 
     #Tests
+    if reactionDict is None:
+        reactionDict = {
+            'decarboxylation': -calculate_mass(['CO2']),
+            'methylation': calculate_mass(['CH2']),
+            'demethylation': -calculate_mass(['CH2']),
+            'hydrogenation': calculate_mass(['H2']),
+            'dehydrogenation': -calculate_mass(['H2']),
+            'hydration': calculate_mass(['H2O']),
+            'dehydration': -calculate_mass(['H2O']),
+            'oxidation': calculate_mass(['O']),
+            'reduction': -calculate_mass(['O'])
+        }
     assert fileFormat in ['graphml', 'gexf', 'none'], "format must be graphml or gexf"
     assert type(filePath) == str, "filePath must be provided as a string"
     formulaList = msTuple[0]
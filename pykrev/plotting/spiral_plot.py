@@ -1,5 +1,6 @@
 from matplotlib import pyplot as plt
 import numpy as np
+from ..formula.msTuple import _mz_order
 def spiral_plot(msTuple, colour=[], size=[], radius=1, theta=3000, mass_order = 'ascending', colourmap = 'viridis'):
     """ 
     Docstring for function pykrev.spiral_plot
@@ -36,9 +37,9 @@ def spiral_plot(msTuple, colour=[], size=[], radius=1, theta=3000, mass_order =
         size = msTuple.intensity/max(msTuple.intensity) * 100
     N = len(msTuple.formula)
     if mass_order == 'ascending':
-        sortIdx = np.argsort(msTuple.mz)
+        sortIdx = _mz_order(msTuple)
     elif mass_order == 'descending':
-        sortIdx = np.argsort(msTuple.mz)[::-1]
+        sortIdx = _mz_order(msTuple)[::-1]
     colour = np.take_along_axis(colour, sortIdx, axis=0)
     size = np.take_along_axis(size, sortIdx, axis=0)
     r = np.linspace(0,radius,N)
@@ -1,6 +1,10 @@
 import unittest
+import os
+import sys
+import tempfile
+from unittest import mock
 import numpy as np
-from pykrev import diversity_indices, ordination_matrix, bray_curtis_matrix, compound_class, normalise_intensity, page_rank, msTuple, msTupleDict
+from pykrev import diversity_indices, diversity_matrix, rao_entropy, ordination_matrix, bray_curtis_matrix, compound_class, register_compound_class, kegg_brite, normalise_intensity, page_rank, msTuple, msTupleDict
 
 class TestDIVERSITY(unittest.TestCase):
 
@@ -100,6 +104,61 @@ class TestDIVERSITY(unittest.TestCase):
         x = (y,z,mz)
         res = diversity_indices(x, indices = ['mz'])
 
+    def test_functional_pairwise(self):
+        y = ['C13H14O5','C13H14N2O4S2','C36H45ClN6O12','C9H11NO2', 'C9H11NO3', 'C11H12N2O2', 'C5H7NO3', 'C5H9NO3', 'C6H12N2O4S2','C6H11NO3S']
+        z = np.array([1000,2432,3000,4201,2000,5990,1000,6520,8000,9001])
+        mz = np.array([232,340,132,904,321,431,3424,200,3204,1000])
+        x = (y,z,mz)
+        res = diversity_indices(x, indices = ['C','HC','mz'], verbose = False)
+        p = normalise_intensity(z)
+        C = np.array([13,13,36,9,9,11,5,5,6,6])
+        correct = sum(p[i] * p[j] * abs(C[i] - C[j]) for i in range(10) for j in range(i+1,10))
+        self.assertAlmostEqual(res['D_f_C'], correct)
+        correct = sum(p[i] * p[j] * abs(mz[i] - mz[j]) for i in range(10) for j in range(i+1,10))
+        self.assertAlmostEqual(res['D_f_mz'], correct)
+        res = diversity_indices((['C5H7NO3','H2O'],np.array([1,2]),[]), indices = ['HC'], verbose = False)
+        self.assertTrue(np.isnan(res['D_f_HC']))
+
+    def test_diversity_matrix(self):
+        testDict = msTupleDict()
+        testDict['x'] = msTuple(['C13H14O5','C9H11NO2','C5H7NO3','C6H12O6'],np.array([1000.,4201.,1000.,300.]),np.array([250.,165.,129.,180.]))
+        testDict['y'] = msTuple(['C9H11NO2','C6H12O6','C11H12N2O2'],np.array([20.,40.,70.]),np.array([165.,180.,204.]))
+        indices = ['r','GS','SW','C','HC','NOSC','mz']
+        res = diversity_matrix(testDict, indices = indices + ['Hill'], q = [0,1,2])
+        self.assertEqual(list(res.index), ['x','y'])
+        for name, msTupleObj in testDict.items():
+            correct = diversity_indices(msTupleObj, indices = indices, verbose = False)
+            for key, value in correct.items():
+                self.assertAlmostEqual(res.loc[name,key], value)
+        self.assertIsNone(np.testing.assert_allclose(res['D_q0'], res['D_r']))
+        self.assertIsNone(np.testing.assert_allclose(res['D_q1'], np.exp(res['D_a_SW'])))
+        self.assertIsNone(np.testing.assert_allclose(res['D_q2'], 1/(1 - res['D_a_GS'])))
+        testDict['z'] = msTuple(['C9H11NO2','C6H12O6'],np.array([0.,0.]),np.array([165.,180.]))
+        res = diversity_matrix(testDict, indices = indices + ['Hill'], q = [0,1,2])
+        self.assertEqual(res.loc['z','D_r'], 0)
+        self.assertTrue(res.loc['z'].drop('D_r').isna().all())
+        self.assertFalse(res.loc[['x','y']].isna().any().any())
+        del testDict['z']
+        res = diversity_matrix(ordination_matrix(testDict, impute_value = 0), indices = ['r','HC'])
+        self.assertEqual(res['D_r'].tolist(), [4,3])
+        self.assertAlmostEqual(res.loc['y','D_f_HC'], diversity_indices(testDict['y'], indices = ['HC'], verbose = False)['D_f_HC'])
+
+    def test_rao_entropy(self):
+        y = ['C13H14O5','C13H14N2O4S2','C36H45ClN6O12','C9H11NO2', 'C9H11NO3', 'C11H12N2O2', 'C5H7NO3', 'C5H9NO3', 'C6H12N2O4S2','C6H11NO3S']
+        z = np.array([1000,2432,3000,4201,2000,5990,1000,6520,8000,9001])
+        mz = np.array([232,340,132,904,321,431,3424,200,3204,1000])
+        x = msTuple(y,z,mz)
+        p = z / z.sum()
+        HC = np.array([14/13,14/13,45/36,11/9,11/9,12/11,7/5,9/5,2,11/6])
+        scaled = np.column_stack([HC / np.ptp(HC), mz / np.ptp(mz)])
+        correct = sum(p[i] * p[j] * np.abs(scaled[i] - scaled[j]).mean() for i in range(10) for j in range(i+1,10))
+        self.assertAlmostEqual(rao_entropy(x, traits = ['HC','mz']), correct)
+        self.assertAlmostEqual(rao_entropy(x, traits = ['HC','mz'], memory_limit = 100, n_jobs = 2), correct)
+        self.assertAlmostEqual(rao_entropy(x, traits = ['HC','mz'], method = 'approximate', n_pairs = 200000, random_state = 0), correct, places = 2)
+        scaled = np.column_stack([(HC - HC.mean()) / HC.std(), (mz - mz.mean()) / mz.std()])
+        correct = sum(p[i] * p[j] * np.sqrt(((scaled[i] - scaled[j])**2).sum()) for i in range(10) for j in range(i+1,10))
+        self.assertAlmostEqual(rao_entropy(x, traits = ['HC','mz'], distance = 'euclidean', memory_limit = 100), correct)
+
     def test_ordination_matrix(self):
         x = msTuple(['A','B','C','D'],np.array([1,2,3,4]),np.array([1,2,3,4]))
         x2 = msTuple(['A','B','D','E','F'],np.array([1,2,3,4,5]),np.array([1,2,3,4,5]))
@@ -107,6 +166,21 @@ class TestDIVERSITY(unittest.TestCase):
         R = msTupleDict()
         ores = ordination_matrix(R)
 
+    def test_ordination_matrix_columns(self):
+        x = msTuple(['C6H12O6','C2H6O','C6H12O6','CH4'],np.array([1,2,3,4]),np.array([1,2,3,4]))
+        x2 = msTuple(['CO2','C2H6O'],np.array([5,6]),np.array([5,6]))
+        ores = ordination_matrix({'x': x, 'x2': x2})
+        self.assertEqual(list(ores.columns), ['C6H12O6','C2H6O','CH4','CO2'])
+        self.assertEqual(ores.values.dtype, np.float64)
+        self.assertEqual(ores.loc['x','C6H12O6'], 1)
+        self.assertTrue(np.isnan(ores.loc['x2','CH4']))
+        fres = ordination_matrix({'x': x, 'x2': x2}, sort_columns = 'formula')
+        self.assertEqual(list(fres.columns), ['C2H6O','C6H12O6','CH4','CO2'])
+        mres = ordination_matrix({'x': x, 'x2': x2}, sort_columns = 'mass', impute_value = 0, dtype = np.float32)
+        self.assertEqual(list(mres.columns), ['CH4','CO2','C2H6O','C6H12O6'])
+        self.assertEqual(mres.values.dtype, np.float32)
+        self.assertEqual(list(mres.loc['x2']), [0, 5, 6, 0])
+
     def test_normalise_ordination(self):
         x = msTuple(['A','B','C','D'],np.array([1,2,3,4]),np.array([1,2,3,4]))
         x2 = msTuple(['A','B','D','E','F'],np.array([1,2,3,4,5]),np.array([1,2,3,4,5]))
@@ -130,6 +204,22 @@ class TestDIVERSITY(unittest.TestCase):
         ores = ordination_matrix(R)
         bres = bray_curtis_matrix(np.array(ores))
 
+    def test_bray_curtis_metrics(self):
+        x = msTuple(['A','B','C','D'],np.array([1,2,3,4]),np.array([1,2,3,4]))
+        x2 = msTuple(['A','B','D','E','F'],np.array([1,2,3,4,5]),np.array([1,2,3,4,5]))
+        x3 = msTuple(['A','D','E','F'],np.array([1,2,3,4]),np.array([1,2,3,4]))
+        ores = ordination_matrix({'x': x, 'x2': x2, 'x3': x3}).reindex(columns = ['A','B','C','D','E','F'])
+        bres = bray_curtis_matrix(ores)
+        self.assertAlmostEqual(bres[0,1], (0 + 0 + 3 + 1 + 4 + 5) / (2 + 4 + 3 + 7 + 4 + 5))
+        self.assertAlmostEqual(bres[2,0], bres[0,2])
+        self.assertEqual(list(np.diag(bres)), [0,0,0])
+        cres = bray_curtis_matrix(ores, square = False, memory_limit = 8)
+        self.assertIsNone(np.testing.assert_allclose(cres, [bres[0,1], bres[0,2], bres[1,2]]))
+        jres = bray_curtis_matrix(ores, metric = 'jaccard', square = False)
+        self.assertIsNone(np.testing.assert_allclose(jres, [1 - 3/6, 1 - 2/6, 1 - 4/5]))
+        sres = bray_curtis_matrix(np.array(ores), metric = 'sorensen', square = False, memory_limit = 8)
+        self.assertIsNone(np.testing.assert_allclose(sres, [1 - 6/9, 1 - 4/8, 1 - 8/9]))
+
     def test_compound_class_MSCC(self):
         y = ['C13H14O5','C13H14N2O4S2','C36H45ClN6O12','C9H11NO2', 'C9H11NO3', 'C11H12N2O2', 'C5H7NO3', 'C5H9NO3', 'C6H12N2O4S2','C6H11NO3S']
         z = np.array([1000,2432,3000,4201,2000,5990,1000,6520,8000,9001])
@@ -148,12 +238,50 @@ class TestDIVERSITY(unittest.TestCase):
         x = (y,[],z)
         res = compound_class(x, method = 'FORM')
 
+    def test_compound_class_FORM_counts(self):
+        x = msTuple(['C10H20O6','C10H12O8','C10H20O2'],np.array([1.,2.,3.]),np.array([1.,2.,3.]))
+        res = compound_class(x, method = 'FORM')
+        self.assertEqual(res[0], ['Amino Sugar-like','Tannin-like','Lipid-like'])
+        self.assertEqual(res[1]['Amino Sugar-like'], 1)
+        self.assertEqual(res[1]['Tannin-like'], 1)
+
+    def test_register_compound_class(self):
+        register_compound_class('test_scheme', [('Nitrogenous', [('N','>=',1)]), ('Oxygenated', [('OC','>',0.5)]), ('Heavy', [('mz','>',500)])],
+                                mode = 'multiple', unmatched = 'Other', exclusive = ['Heavy'])
+        x = msTuple(['C5H7NO3','C5H7NO1','C6H12O6','C6H14','C30H50'],np.array([1.,2.,3.,4.,5.]),np.array([129.,97.,180.,86.,600.]))
+        res = compound_class(x, method = 'test_scheme')
+        self.assertEqual(res[0], ['Double matched: Nitrogenous Oxygenated','Nitrogenous','Oxygenated','Other','Heavy'])
+        self.assertEqual(res[1], {'Nitrogenous':1,'Oxygenated':1,'Heavy':1,'Other':1,'Double matched':1})
+
     def test_compound_class_KEGG(self):
         y = ['C13H14O5','C13H14N2O4S2','C36H45ClN6O12','C9H11NO2', 'C9H11NO3', 'C11H12N2O2', 'C5H7NO3', 'C5H9NO3', 'C6H12N2O4S2','C6H11NO3S']
         z = np.array([1000,2432,3000,4201,2000,5990,1000,6520,8000,9001])
         x = msTuple(y,[],z)
         res = compound_class(x, method = 'KEGG_All')
      
+    def test_kegg_brite(self):
+        x = msTuple(['C9H11NO2','C99H99','C13H14O5'],np.array([1.,2.,3.]),np.array([165.,1000.,250.]))
+        res = kegg_brite(x, database = 'All')
+        self.assertEqual(list(res.columns), ['A','B','C','D','E','F'])
+        self.assertEqual(res.loc[0,'E'], 'C00079')
+        self.assertTrue(res.loc[1].isna().all())
+        self.assertEqual(res['A'].tolist()[::2], compound_class(x, method = 'KEGG_All')[0][::2])
+        res = kegg_brite(x, database = 'All', all_matches = True)
+        self.assertEqual(sorted(set(res.index)), [0,2])
+        self.assertTrue((res['F'] == np.array(x.formula)[res.index]).all())
+     
+    def test_kegg_brite_cache(self):
+        kegg_module = sys.modules[kegg_brite.__module__]
+        x = msTuple(['C9H11NO2','C99H99'],np.array([1.,2.]),np.array([165.,1000.]))
+        with tempfile.TemporaryDirectory() as directory, mock.patch.dict(os.environ, {'XDG_CACHE_HOME': directory, 'LOCALAPPDATA': directory}):
+            kegg_module._BRITE_CACHE.pop('Toxin', None)
+            res = kegg_brite(x, database = 'Toxin')
+            self.assertEqual(len(os.listdir(os.path.join(directory, 'pykrev'))), 1)
+            kegg_module._BRITE_CACHE.pop('Toxin', None)
+            self.assertTrue(kegg_brite(x, database = 'Toxin').equals(res))
+            kegg_module._BRITE_CACHE.pop('Toxin', None)
+        self.assertEqual([f for f in os.listdir(kegg_module._DATA_DIRECTORY) if f.endswith('.npz')], [])
+
     def test_page_rank(self):
         x = (['C13H14O5','C13H14N2O4S2','C36H45ClN6O12','C9H11NO2', 'C9H11NO3', 'C11H12N2O2', 'C5H7NO3', 'C5H9NO3', 'C6H12N2O4S2','C6H11NO3S'],[],[])
         correct = np.array([ 2.17651119,  2.17651119,  2.17651119, 21.73523322, 21.73523322, 2.17651119, 21.73523322, 21.73523322,  2.17651119,  2.17651119])
@@ -1,6 +1,12 @@
 import unittest
+import os
+import sys
+import subprocess
+import tempfile
+import pickle
 import numpy as np
-from pykrev import element_counts, element_ratios, double_bond_equivalent, aromaticity_index, nominal_oxidation_state, calculate_mass, kendrick_mass_defect, find_intersections, filter_spectral_interference, msTupleDict, msTuple, average_mstuple
+import pandas as pd
+from pykrev import element_counts, element_matrix, descriptors, formula_cache_info, clear_formula_cache, configure_formula_cache, element_ratios, double_bond_equivalent, aromaticity_index, nominal_oxidation_state, calculate_mass, kendrick_mass_defect, find_intersections, filter_spectral_interference, msTupleDict, msTupleStore, msTuple, average_mstuple, FormulaVocabulary, CodedFormula, read_formularity, read_batch_formularity, read_corems, read_directory, read_npz, iter_csv, iter_formularity, iter_corems
 
 class TestFORMULA(unittest.TestCase):
 
@@ -13,6 +19,31 @@ class TestFORMULA(unittest.TestCase):
         res = element_counts(x)
         self.assertEqual(res, correct)
 
+    def test_element_matrix(self):
+        x = msTuple(['C13H14O5','C10H4Cl2F3NO3','C6H5Br','C9H12O6 13C1'],[],[])
+        correct = np.array([[13,14,0,0,5,0],[10,4,0,1,3,0],[6,5,1,0,0,0],[9,12,0,0,6,1]])
+        res, idx = element_matrix(x, elements = ['C','H','Br','N','O','13C'])
+        self.assertIsNone(np.testing.assert_array_equal(res, correct))
+        self.assertEqual(idx, {'C':0,'H':1,'Br':2,'N':3,'O':4,'13C':5})
+
+    def test_formula_cache(self):
+        info = formula_cache_info()
+        self.addCleanup(configure_formula_cache, max_bytes = info['max_bytes'], enabled = info['enabled'])
+        configure_formula_cache(enabled = True)
+        clear_formula_cache()
+        element_matrix(['C13H14O5','C6H6O2','C13H14O5'])
+        element_matrix(['C13H14O5'])
+        info = formula_cache_info()
+        self.assertEqual((info['hits'], info['misses'], info['size']), (1, 2, 2))
+        configure_formula_cache(max_bytes = info['bytes'] - 1)
+        self.assertEqual(formula_cache_info()['size'], 1)
+        self.assertEqual(formula_cache_info()['evictions'], 1)
+        self.assertLessEqual(formula_cache_info()['bytes'], info['bytes'] - 1)
+        configure_formula_cache(enabled = False)
+        res, idx = element_matrix(['C13H14O5'])
+        self.assertEqual(formula_cache_info()['size'], 0)
+        self.assertIsNone(np.testing.assert_array_equal(res, np.array([[13,14,0,5,0,0,0,0]])))
+
     def test_element_ratios(self):
         x = msTuple(['C13H14O5','C13H14N2O4S2','C36H45ClN6O12'],[],[])
         correct = [{'HC':1.0769230769230769,'OC':0.38461538461538464,'NC':0.0},{'HC':1.0769230769230769,'OC':0.3076923076923077,'NC':0.15384615384615385},{'HC':1.25,'OC':0.3333333333333333,'NC':0.16666666666666666}]
@@ -43,6 +74,23 @@ class TestFORMULA(unittest.TestCase):
         res = nominal_oxidation_state(x)
         self.assertIsNone(np.testing.assert_array_equal(np.round(res,3),np.round(correct,3)))
 
+    def test_descriptors(self):
+        x = msTuple(['C13H14O5','C13H14N2O4S2','C36H45ClN6O12','H2O'],[],[])
+        res = descriptors(x, ['rAI','DBE','NOSC','HC','N','mass'])
+        self.assertEqual(list(res.columns), ['rAI','DBE','NOSC','HC','N','mass'])
+        self.assertIsNone(np.testing.assert_array_equal(res['DBE'], double_bond_equivalent(x)))
+        self.assertIsNone(np.testing.assert_array_equal(res['rAI'], aromaticity_index(x, index_type = 'rAI')))
+        self.assertIsNone(np.testing.assert_array_equal(res['N'], np.array([0,2,6,0])))
+        self.assertIsNone(np.testing.assert_array_almost_equal(res['mass'], calculate_mass(x)))
+        self.assertTrue(np.isnan(res['NOSC'][3]) and np.isnan(res['HC'][3]))
+        y = msTuple(['C6H5Br','C6H5I','C6H6O1','C2H6Xe1'],[],[])
+        alone = descriptors(y, ['DBE','rAI','NOSC'])
+        withMass = descriptors(y, ['DBE','rAI','NOSC','mass','Xe'])
+        self.assertTrue(alone.equals(withMass[['DBE','rAI','NOSC']]))
+        self.assertTrue(y.descriptors(['DBE','rAI','NOSC']).equals(y.descriptors(['DBE','mass','rAI','NOSC'])[['DBE','rAI','NOSC']]))
+        self.assertIsNone(np.testing.assert_array_equal(alone['DBE'], double_bond_equivalent(y)))
+        self.assertIsNone(np.testing.assert_array_almost_equal(withMass['mass'], calculate_mass(y)))
+
     def test_mass_mono(self):
         x = msTuple(['C3H7N1O2','C5H11N1O2','C5H11N1O2P1S2','C7H4ClFO3'],[],[])
         correct = np.array([89.04768,117.0790,211.9969,189.98330])
@@ -55,6 +103,19 @@ class TestFORMULA(unittest.TestCase):
         res = calculate_mass(x,method = 'monoisotopic', protonated = True, ion_charge = -1)
         self.assertIsNone(np.testing.assert_array_equal(np.round(res,3),np.round(correct,3)))
 
+    def test_mass_ions(self):
+        x = msTuple(['C46H43N1O35','C7H4ClFO3','C6H5Br'],[],[])
+        res = calculate_mass(x, ions = ['[M-H]-','[M+Na]+','[M-2H]2-','[M]'])
+        self.assertEqual(res.shape, (3,4))
+        self.assertIsNone(np.testing.assert_array_almost_equal(res[:,0], calculate_mass(x, protonated = True, ion_charge = -1)))
+        self.assertIsNone(np.testing.assert_array_almost_equal(res[:,2], calculate_mass(x, protonated = True, ion_charge = -2)))
+        self.assertRaises(AssertionError, calculate_mass, x, ions = ['[M+Li]+'])
+        self.assertRaises(AssertionError, calculate_mass, x, ions = ['[M+H]'])
+        self.assertRaises(AssertionError, calculate_mass, x, ions = ['[M-2H]2'])
+        self.assertRaises(AssertionError, calculate_mass, x, method = {'C': 12, 'O': 16}, protonated = True, ion_charge = 1)
+        self.assertIsNone(np.testing.assert_array_equal(np.round(res[:,1],4), np.round(res[:,3] + 22.98976928 - 0.0005485,4)))
+        self.assertEqual(np.round(res[2,3],4), 155.9575)
+
     def test_mass_nominal(self):
         x = msTuple(['C3H7N1O2','C5H11N1O2','C5H11N1O2P1S2','C7H4ClFO3'],[],[])
         correct = np.array([89,117,212,190])
@@ -116,6 +177,217 @@ class TestFORMULA(unittest.TestCase):
         res1, res2, res3 = filter_spectral_interference(xt)
         self.assertIsNone(np.testing.assert_array_equal(res3,np.array([98.8121,136.2304])))
     
+    def test_filter_si_pairs(self):
+        x3 = np.array([97.9079,98.4096,136.2304])
+        x2 = ["a","b","c"]
+        x = np.array([14982198,1995016,1039854])
+        xt = msTuple(x2,x,x3)
+        res, pairs = xt.filter_spectral_interference(verbose = False, return_pairs = True)
+        self.assertEqual(res.formula, ["c"])
+        self.assertIsNone(np.testing.assert_array_equal(pairs, np.array([[1,0]])))
+    
+    def test_query(self):
+        xt = msTuple(['a','b','c','d','e'], np.array([5.,50.,500.,5000.,50000.]), np.array([100.,300.,500.,700.,900.]))
+        res = xt.query().mz(200,800).intensity(10,None).where(np.array([True,True,False,True,True])).collect()
+        self.assertEqual(res.formula, ['b','d'])
+        self.assertIsNone(np.testing.assert_array_equal(res.mz, np.array([300.,700.])))
+        chained = xt.filter_mz(200,800).filter_intensity(10,np.inf).filter_bool(np.array([True,True,False]))
+        self.assertEqual(chained.formula, ['b','c'])
+    
+    def test_mz_index(self):
+        xt = msTuple(['a','b','c','d'], np.array([1.,2.,3.,4.]), np.array([300.,100.,400.,200.]))
+        self.assertIsNone(np.testing.assert_array_equal(xt.mz_order(), np.array([1,3,0,2])))
+        self.assertEqual(xt.mz_window(150,400).formula, ['d','a'])
+        self.assertIsNone(np.testing.assert_array_equal(xt.nearest_mz([200.0001,250.,399.9999], ppm = 1), np.array([3,-1,2])))
+        self.assertEqual([f for f,_,_ in xt.iter_sorted()], ['b','d','a','c'])
+        self.assertIsNone(np.testing.assert_array_equal(xt._replace(mz = np.array([4.,3.,2.,1.])).mz_order(), np.array([3,2,1,0])))
+    
+    def test_formula_index(self):
+        x = msTuple(['A','B','A','C'], np.array([1,2,3,4]), np.array([1,2,3,4]))
+        y = msTuple(['C','A'], np.array([5,6]), np.array([5,6]))
+        self.assertEqual(x.formula_index(), {'A':0,'B':1,'C':3})
+        testDict = msTupleDict()
+        testDict['x'] = x
+        testDict['y'] = y
+        self.assertEqual(testDict.formula_index()['C'], [('x',3),('y',0)])
+        del testDict['x']
+        self.assertEqual(testDict.formula_index(), {'C':[('y',0)],'A':[('y',1)]})
+    
+    def test_formula_vocabulary(self):
+        vocab = FormulaVocabulary(['C4H5O6','C5H6O7'])
+        codes = vocab.encode(['C5H6O7','C6H8O2','C4H5O6'])
+        self.assertIsNone(np.testing.assert_array_equal(codes, np.array([1,2,0])))
+        self.assertEqual(vocab.decode(codes), ['C5H6O7','C6H8O2','C4H5O6'])
+        self.assertIsNone(np.testing.assert_array_equal(vocab.encode(['C9H9', 'C4H5O6'], add = False), np.array([-1,0])))
+        xt = msTuple(['C4H5O6','C5H6O7','C4H5O6','C6H8O2'], np.array([4.,5.,6.,7.]), np.array([1.,2.,3.,4.]))
+        xt.formula_codes()
+        res = xt.filter_intensity(4.5,np.inf)
+        self.assertIs(res.vocabulary(), xt.vocabulary())
+        self.assertIsNone(np.testing.assert_array_equal(res.formula_codes(), np.array([1,0,2])))
+        self.assertIsNone(np.testing.assert_array_equal(res.element_matrix()[0], element_matrix(res)[0]))
+        self.assertIsNone(np.testing.assert_array_equal(xt.take(slice(1,3)).mz, np.array([2.,3.])))
+    
+    def test_shared_vocabulary(self):
+        x = msTuple(['A','B','C'], np.array([1,2,3]), np.array([1,2,3]))
+        y = msTuple(['C','D'], np.array([4,5]), np.array([4,5]))
+        testDict = msTupleDict()
+        testDict['x'] = x
+        testDict['y'] = y
+        self.assertEqual(testDict.vocabulary().formula, ['A','B','C','D'])
+        self.assertIsNone(np.testing.assert_array_equal(testDict.formula_codes()['y'], np.array([2,3])))
+        self.assertIs(testDict['x'].formula[2], testDict['y'].formula[0])
+        self.assertIs(testDict.subset(['y']).vocabulary(), testDict.vocabulary())
+        self.assertEqual(testDict.popitem()[0], 'y')
+        self.assertEqual(list(testDict.formula_codes()), ['x'])
+        testDict.popitem()
+        self.assertRaises(KeyError, testDict.popitem)
+    
+    def test_coded_formula(self):
+        x = msTuple(['C4H5O6','C5H6O7','C6H8O2','C5H6O7'], np.array([4.,5.,6.,7.]), np.array([120.,150.,90.,110.]))
+        y = x.compact()
+        self.assertIsInstance(y.formula, CodedFormula)
+        self.assertEqual(y.formula, x.formula)
+        self.assertEqual(y.formula[1], 'C5H6O7')
+        self.assertEqual(y.formula.index('C5H6O7', 2), 3)
+        self.assertEqual(y.formula.count('C5H6O7'), 2)
+        self.assertNotIn('C6H12O6', y.formula)
+        self.assertEqual(y.filter_mz(100,160).formula, ['C4H5O6','C5H6O7','C5H6O7'])
+        self.assertIsInstance(y.filter_mz(100,160).formula, CodedFormula)
+        self.assertIs(y.filter_mz(100,160).vocabulary(), y.vocabulary())
+        self.assertTrue(descriptors(y).equals(descriptors(x)))
+        self.assertEqual(pickle.loads(pickle.dumps(y)).formula, x.formula)
+        testDict = msTupleDict()
+        testDict['x'] = x
+        testDict['y'] = y.filter_mz(100,160)
+        self.assertIsInstance(testDict['x'].formula, list)
+        testDict.compact()
+        self.assertIsInstance(testDict['x'].formula, CodedFormula)
+        self.assertIsInstance(testDict.subset(['y'])['y'].formula, CodedFormula)
+        self.assertIsInstance(pickle.loads(pickle.dumps(testDict))['x'].formula, CodedFormula)
+        self.assertEqual(testDict.intersections(), {('x','y'): {'C4H5O6','C5H6O7'}, ('x',): {'C6H8O2'}, ('y',): set()})
+        with tempfile.TemporaryDirectory() as directory:
+            msTupleStore(directory)['x'] = x
+            store = msTupleStore(directory, compact = True)
+            self.assertIsInstance(store['x'].formula, CodedFormula)
+            self.assertEqual(store.cache_info()['bytes'], 80) # 4 + 8 + 8 bytes per peak
+    
+    def test_read_formularity(self):
+        report = pd.DataFrame({'Mass':[100.1,200.2,300.3,400.4],'C':[5,0,6,7],'H':[6,0,8,9],'O':[3,1,0,2],'N':[0,0,1,0],'C13':[0,0,0,1],'S':[0,0,1,0],'P':[0,0,0,0],
+                               'Na':[0,0,0,0],'El_comp':['','','',''],'Class':['Lignin','','Protein','Lignin'],'NeutralMass':[0,0,0,0],'Error_ppm':[0.1,0.2,0.3,0.4],'Candidates':[1,1,1,1],'sample':[10,20,30,40]})
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'report.csv')
+            report.to_csv(path, index = False)
+            res, metadata = read_formularity(path, return_metadata = True)
+        self.assertEqual(res.formula, ['C5H6O3','C6H8N1S1'])
+        self.assertIsNone(np.testing.assert_array_equal(res.intensity, np.array([10.,30.])))
+        self.assertEqual(metadata['Class'].tolist(), ['Lignin','Protein'])
+    
+    def test_read_batch_formularity(self):
+        report = pd.DataFrame({'Mass':[100.1,200.2,300.3],'C':[5,0,6],'H':[6,0,8],'O':[3,1,0],'N':[0,0,1],'C13':[0,0,0],'S':[0,0,1],'P':[0,0,0],'Na':[0,0,0],'El_comp':['','',''],
+                               'Class':['Lignin','','Protein'],'NeutralMass':[0,0,0],'Error_ppm':[0.1,0.2,0.3],'Candidates':[1,1,1],'A':[10,20,0],'B':[0,5,30],'C1':[0,0,0]})
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'report.csv')
+            report.to_csv(path, index = False)
+            res = read_batch_formularity(path)
+        self.assertEqual(list(res.keys()), ['A','B','C1'])
+        self.assertEqual(res['A'].formula, ['C5H6O3'])
+        self.assertEqual(res['B'].formula, ['C6H8N1S1'])
+        self.assertIsNone(np.testing.assert_array_equal(res['B'].mz, np.array([300.3])))
+        self.assertEqual(res['C1'].formula, [])
+    
+    def test_read_corems(self):
+        df = pd.DataFrame({'Index':[1,2,2,3,3],'Is Isotopologue':[0,0,0,0,1],'C':[5,6,7,8,8],'H':[6,8,10,12,12],'O':[3,np.nan,1,2,2],'N':[0,1,0,0,0],
+                           'Peak Height':[10.,20.,30.,40.,50.],'Calibrated m/z':[100.,200.,200.1,300.,301.],'Confidence Score':[0.9,0.2,0.8,0.7,0.7],'m/z Error (ppm)':[0.1,-0.05,0.3,0.2,0.2]})
+        res = read_corems(df)
+        self.assertEqual(res.formula, ['C5H6O3','C8H12O2'])
+        res = read_corems(df, best_candidate = 'Confidence Score')
+        self.assertEqual(res.formula, ['C5H6O3','C7H10O1','C8H12O2'])
+        res = read_corems(df, best_candidate = 'm/z Error (ppm)')
+        self.assertEqual(res.formula, ['C5H6O3','C6H8N1','C8H12O2'])
+    
+    def test_iter_readers(self):
+        report = pd.DataFrame({'Mass':[100.1,200.2,300.3,400.4],'C':[5,0,6,7],'H':[6,0,8,9],'O':[3,1,0,2],'N':[0,0,1,0],'C13':[0,0,0,1],'S':[0,0,1,0],'P':[0,0,0,0],
+                               'Class':['Lignin','','Protein','Lignin'],'Error_ppm':[0.1,0.2,0.3,0.4],'sample':[10,20,30,40]})
+        corems = pd.DataFrame({'Index':[1,2,2,3,3],'Is Isotopologue':[0,0,0,0,1],'C':[5,6,7,8,8],'H':[6,8,10,12,12],'O':[3,np.nan,1,2,2],'N':[0,1,0,0,0],
+                               'Peak Height':[10.,20.,30.,40.,50.],'Calibrated m/z':[100.,200.,200.1,300.,301.],'Confidence Score':[0.9,0.2,0.8,0.7,0.7]})
+        with tempfile.TemporaryDirectory() as directory:
+            msTuple(['C4H5O6','C5H6O7','C6H8O2'], np.array([4.,5.,6.]), np.array([120.,5.,90.])).to_csv(os.path.join(directory, 'x.csv'))
+            res = [chunk.formula for chunk in iter_csv(os.path.join(directory, 'x.csv'), column_headers = True, chunksize = 2)]
+            self.assertEqual(res, [['C4H5O6','C5H6O7'],['C6H8O2']])
+            report.to_csv(os.path.join(directory, 'report.csv'), index = False)
+            res = [chunk.formula for chunk in iter_formularity(os.path.join(directory, 'report.csv'), chunksize = 2)]
+            self.assertEqual(res, [['C5H6O3'],['C6H8N1S1']])
+            corems.to_csv(os.path.join(directory, 'corems.csv'), index = False)
+            res = [chunk.formula for chunk in iter_corems(os.path.join(directory, 'corems.csv'), chunksize = 2)]
+            self.assertEqual(res, [['C5H6O3'],['C8H12O2']])
+            res = [chunk.formula for chunk in iter_corems(os.path.join(directory, 'corems.csv'), chunksize = 2, best_candidate = 'Confidence Score')]
+            self.assertEqual(res, [['C5H6O3'],['C7H10O1'],['C8H12O2']])
+    
+    def test_read_directory(self):
+        with tempfile.TemporaryDirectory() as directory:
+            msTuple(['C4H5O6','C5H6O7'], np.array([4.,5.]), np.array([120.,5.])).to_csv(os.path.join(directory, 'x.csv'))
+            msTuple(['C5H6O7','C6H8O2'], np.array([6.,7.]), np.array([110.,90.])).to_csv(os.path.join(directory, 'y.csv'))
+            with open(os.path.join(directory, 'z.csv'), 'w') as f:
+                f.write('formula,intensity\n')
+            res, errors = read_directory(directory, reader = 'csv', n_jobs = 2, verbose = False, return_errors = True, column_headers = True)
+        self.assertEqual(list(res.keys()), ['x','y'])
+        self.assertEqual(res['y'].formula, ['C5H6O7','C6H8O2'])
+        self.assertEqual([os.path.basename(path) for path in errors], ['z.csv'])
+    
+    def test_npz(self):
+        testDict = msTupleDict()
+        testDict['x'] = msTuple(['C4H5O6','C5H6O7'], np.array([4.,5.]), np.array([120.,5.]))
+        testDict['y'] = msTuple(['C5H6O7','C6H8O2','C7H8O2'], np.array([6.,7.,8.]), np.array([110.,90.,80.]))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'cohort.npz')
+            testDict.to_npz(path, descriptors = ['HC','DBE'])
+            for mmap in [False, True]:
+                res = read_npz(path, mmap = mmap)
+                self.assertEqual(list(res.keys()), ['x','y'])
+                self.assertEqual(res['y'].formula, ['C5H6O7','C6H8O2','C7H8O2'])
+                self.assertIsNone(np.testing.assert_array_equal(res['y'].mz, np.array([110.,90.,80.])))
+                self.assertIsNone(np.testing.assert_array_equal(res['x'].descriptors(['HC','DBE']), testDict['x'].descriptors(['HC','DBE'])))
+                del res
+            path = os.path.join(directory, 'sample.npz')
+            testDict['x'].to_npz(path)
+            self.assertEqual(read_npz(path).formula, ['C4H5O6','C5H6O7'])
+    
+    def test_mstuple_store(self):
+        x = msTuple(['C4H5O6','C5H6O7'], np.array([4.,5.]), np.array([120.,5.]))
+        y = msTuple(['C5H6O7','C6H8O2'], np.array([6.,7.]), np.array([110.,90.]))
+        with tempfile.TemporaryDirectory() as directory:
+            store = msTupleStore(directory, memory_budget = 48) # each sample is 16 + 16 + 8 * 2 bytes
+            store['x'] = x
+            store['y'] = y
+            store = msTupleStore(directory, memory_budget = 48)
+            self.assertEqual(list(store.keys()), ['x','y'])
+            self.assertEqual(store['x'].formula, ['C4H5O6','C5H6O7'])
+            self.assertEqual(store['y'].formula, ['C5H6O7','C6H8O2'])
+            self.assertEqual(store.cache_info()['samples'], 1)
+            self.assertEqual(list(store._cache), ['y'])
+            self.assertEqual(store.cache_info()['bytes'], 48)
+            self.assertFalse(store == {})
+            self.assertEqual([key for key, _ in store.items()], ['x','y'])
+            self.assertEqual(len(store.values()), 2)
+            self.assertEqual(list(store.copy().keys()), ['x','y'])
+            self.assertEqual(pickle.loads(pickle.dumps(store))['x'].formula, ['C4H5O6','C5H6O7'])
+            testDict = msTupleDict()
+            testDict['x'] = x
+            testDict['y'] = y
+            self.assertTrue(store.to_OrdinationMatrix().equals(testDict.to_OrdinationMatrix()))
+            self.assertEqual(store.intersections(), testDict.intersections())
+            with store:
+                store['z'] = msTuple(['C6H8O2'], np.array([1.]), np.array([90.]))
+                self.assertEqual(list(msTupleStore(directory).keys()), ['x','y']) # the index is written at the end of the block
+            self.assertEqual(list(msTupleStore(directory).keys()), ['x','y','z'])
+            with self.assertRaises(AssertionError): # z has a single formula, it is invalid
+                store.to_OrdinationMatrix()
+    
+    def test_lazy_import(self):
+        script = "import sys, pykrev; print(sorted(m for m in ['matplotlib','networkx','scipy'] if m in sys.modules)); pykrev.page_rank; print('networkx' in sys.modules)"
+        res = subprocess.run([sys.executable, '-c', script], capture_output = True, text = True, check = True).stdout.split()
+        self.assertEqual(res, ['[]', 'False'])
+    
     def test_average_mstuple(self):
         x = msTuple(['C4H5O6','C5H6O7'], np.array([4,5]), np.array([120,5]))
         y = msTuple(['C4H5O6','C5H6O7'], np.array([6,6]), np.array([110,110]))